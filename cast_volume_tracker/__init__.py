@@ -1,39 +1,103 @@
 """Support to track cast volume."""
+import asyncio
+from collections import namedtuple
+import copy
+import json
 import logging
+import math
+import time
 
 import voluptuous as vol
 
 import homeassistant.helpers.config_validation as cv
-from homeassistant.const import ATTR_ENTITY_ID, CONF_NAME, EVENT_HOMEASSISTANT_START, SERVICE_VOLUME_MUTE, SERVICE_VOLUME_SET, STATE_IDLE, STATE_PAUSED, STATE_PLAYING
+from homeassistant.const import ATTR_ENTITY_ID, CONF_NAME, EVENT_HOMEASSISTANT_START, EVENT_STATE_CHANGED, SERVICE_VOLUME_MUTE, SERVICE_VOLUME_SET, STATE_IDLE, STATE_PAUSED, STATE_PLAYING
 from homeassistant.components.media_player.const import ATTR_MEDIA_VOLUME_LEVEL, ATTR_MEDIA_VOLUME_MUTED
 from homeassistant.components.media_player.const import DOMAIN as MEDIA_PLAYER_DOMAIN
 from homeassistant.helpers.entity_component import EntityComponent
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.script import Script
+from homeassistant.helpers.storage import Store
 
 from homeassistant.core import callback
-from homeassistant.helpers.event import async_track_state_change
+from homeassistant.helpers.event import async_call_later
 
 _LOGGER = logging.getLogger(__name__)
 
 DOMAIN = 'cast_volume_tracker'
 ENTITY_ID_FORMAT = DOMAIN + '.{}'
 
+# `hass.data` key for the cast networks (network name -> `CastNetwork`)
+DATA_CAST_NETWORKS = DOMAIN + '_networks'
+DEFAULT_NETWORK = 'default'
+
+# `hass.data` key for the `StateChangeDispatcher`
+DATA_DISPATCHER = DOMAIN + '_dispatcher'
+
+# `hass.data` key for the rate-limited `media_player.volume_set` queues (media player entity ID -> `VolumeSetQueue`)
+DATA_VOLUME_SET_QUEUES = DOMAIN + '_volume_set_queues'
+
+# `hass.data` key for the trace recorders (trace file path -> `CastVolumeTrackerTraceRecorder`)
+DATA_TRACE_RECORDERS = DOMAIN + '_trace_recorders'
+
+# `hass.data` key for the `Store` that holds the snapshot of the cast networks
+DATA_STORE = DOMAIN + '_store'
+
+# `hass.data` key for whether a write of the snapshot is scheduled
+DATA_SNAPSHOT_SCHEDULED = DOMAIN + '_snapshot_scheduled'
+STORAGE_KEY = DOMAIN
+STORAGE_VERSION = 1
+
+# how long (in seconds) to wait before writing the snapshot, so that changes are written in batches
+STORAGE_SAVE_DELAY = 10.
+
 CAST_ON_STATES = (STATE_IDLE, STATE_PAUSED, STATE_PLAYING)
 
+# how long (in seconds) to wait for a media player to report a volume level that was set by its tracker
+ECHO_TIMEOUT = 5.
+
+# the maximum number of volume commands per tracker whose echoes are awaited
+MAX_PENDING_VOLUME_LEVELS = 10
+
+# values that are derived from the running aggregates of a group are rounded to this many digits, so that the rounding
+# errors which accumulate in the aggregates don't leak into the state attributes and the service calls
+VALUE_DIGITS = 6
+
+# the ways in which `CastVolumeTracker.update` can handle a media player state
+TRANSITION_OFF_TO_ON = 'off_to_on'
+TRANSITION_ON_TO_OFF = 'on_to_off'
+TRANSITION_ON_TO_ON = 'on_to_on'
+TRANSITION_ECHO = 'echo'
+TRANSITION_NONE = 'no_op'
+TRANSITIONS = (TRANSITION_OFF_TO_ON, TRANSITION_ON_TO_OFF, TRANSITION_ON_TO_ON, TRANSITION_ECHO, TRANSITION_NONE)
+
+CONF_COALESCE_WINDOW = 'coalesce_window'
 CONF_DEFAULT_VOLUME_LEVEL = 'default_volume_level'
 CONF_MEMBERS = 'members'
 CONF_MEMBERS_EXCLUDED_WHEN_OFF = 'members_excluded_when_off'
 CONF_MUTE_WHEN_OFF = 'mute_when_off'
+CONF_NETWORK = 'network'
 CONF_OFF_SCRIPT = 'off_script'
 CONF_ON_SCRIPT = 'on_script'
 CONF_PARENTS = 'parents'
+CONF_STATISTICS = 'statistics'
+CONF_TRACE = 'trace'
+CONF_VOLUME_SET_INTERVAL = 'volume_set_interval'
+
+SERVICE_DIAGNOSTICS = 'diagnostics'
+SERVICE_VOLUME_SET_MANY = 'volume_set_many'
+SERVICE_RECONCILE = 'reconcile'
+SERVICE_RESTORE = 'restore'
+SERVICE_SNAPSHOT = 'snapshot'
 
 
 SERVICE_DEFAULT_SCHEMA = vol.Schema({
     vol.Optional(ATTR_ENTITY_ID): cv.entity_ids
 })
 
+SERVICE_RECONCILE_SCHEMA = vol.Schema({
+    vol.Optional(CONF_NETWORK): vol.All(cv.ensure_list, [cv.string])
+})
+
 SERVICE_VOLUME_MUTE_SCHEMA = vol.Schema({
     vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
     vol.Required(ATTR_MEDIA_VOLUME_MUTED): cv.boolean,
@@ -44,6 +108,161 @@ SERVICE_VOLUME_SET_SCHEMA = vol.Schema({
     vol.Required(ATTR_MEDIA_VOLUME_LEVEL): vol.Coerce(float),
 })
 
+ATTR_VOLUME_LEVELS = 'volume_levels'
+
+SERVICE_VOLUME_SET_MANY_SCHEMA = vol.Schema({
+    vol.Required(ATTR_VOLUME_LEVELS): {cv.entity_id: vol.Coerce(float)},
+})
+
+# `(service, schema, CastVolumeTrackerEntity method)` tuples for the services that target cast volume tracker entities
+ENTITY_SERVICES = (
+    (SERVICE_VOLUME_MUTE, SERVICE_VOLUME_MUTE_SCHEMA, 'async_volume_mute'),
+    (SERVICE_VOLUME_SET, SERVICE_VOLUME_SET_SCHEMA, 'async_volume_set'),
+    (SERVICE_DIAGNOSTICS, SERVICE_DEFAULT_SCHEMA, 'async_diagnostics'),
+)
+
+
+# =========================================================================== #
+#                                                                             #
+#                                 Statistics                                  #
+#                                                                             #
+# =========================================================================== #
+class CastVolumeTrackerStatistics(object):
+    """Performance counters for a cast volume tracker."""
+
+    __slots__ = ('updates', 'transitions', 'service_calls', 'update_time', 'dispatch_time', 'settle_count', 'settle_time', 'settle_time_max', '_unsettled_since')
+
+    def __init__(self):
+        self.updates = 0
+        self.transitions = {transition: 0 for transition in TRANSITIONS}
+        self.service_calls = 0
+
+        # time spent (in seconds) in `update()` and performing service calls
+        self.update_time = 0.
+        self.dispatch_time = 0.
+
+        # time (in seconds, according to the network's clock) from a media player change until equilibrium
+        self.settle_count = 0
+        self.settle_time = 0.
+        self.settle_time_max = 0.
+        self._unsettled_since = None
+
+    def record_update(self, cast, transition, elapsed, service_args):
+        """Record a call to ``cast.update()``."""
+        self.updates += 1
+        self.transitions[transition] += 1
+        self.update_time += elapsed
+        self.service_calls += len(service_args)
+
+        if cast.equilibrium:
+            if self._unsettled_since is not None:
+                settle_time = cast.cast_network.clock() - self._unsettled_since
+                self._unsettled_since = None
+                self.settle_count += 1
+                self.settle_time += settle_time
+                self.settle_time_max = max(self.settle_time_max, settle_time)
+
+        elif self._unsettled_since is None:
+            self._unsettled_since = cast.cast_network.clock()
+
+    def record_dispatch(self, elapsed, service_args):
+        """Record service calls that were performed outside of ``update()``."""
+        self.dispatch_time += elapsed
+        self.service_calls += len(service_args)
+
+    def as_dict(self):
+        """Get the statistics as a dictionary."""
+        return {'updates': self.updates,
+                'transitions': dict(self.transitions),
+                'service_calls': self.service_calls,
+                'update_time': round(self.update_time, 6),
+                'dispatch_time': round(self.dispatch_time, 6),
+                'settle_count': self.settle_count,
+                'settle_time_mean': round(self.settle_time / self.settle_count, 3) if self.settle_count else None,
+                'settle_time_max': round(self.settle_time_max, 3)}
+
+
+# =========================================================================== #
+#                                                                             #
+#                               Trace recording                               #
+#                                                                             #
+# =========================================================================== #
+class CastVolumeTrackerTraceRecorder(object):
+    """Append the inputs and outputs of cast volume trackers to a trace file, one JSON object per line.
+
+    Each record has a timestamp ``t`` (according to the network's clock) and a ``type``:
+
+    * ``start``: a tracker's attributes and its media player's state when the tracker starts listening
+    * ``state``: a media player state change that was received by a tracker
+    * ``command``: a ``cast_volume_tracker`` service call (``service`` and ``data``)
+    * ``decision``: a tracker's attributes after it was re-evaluated
+    * ``call``: a service call that was emitted by a tracker
+
+    The records are written in batches in the executor, so that the event loop is not blocked.
+
+    """
+
+    def __init__(self, hass, path, clock=time.monotonic):
+        self.hass = hass
+        self.path = path
+        self.clock = clock
+        self._lines = []
+        self._writing = False
+
+    def record(self, record_type, **fields):
+        """Add a record to the trace."""
+        fields['t'] = round(self.clock(), 6)
+        fields['type'] = record_type
+        self._lines.append(json.dumps(fields, separators=(',', ':')))
+
+        if not self._writing:
+            self._writing = True
+            self.hass.async_create_task(self._async_write())
+
+    async def _async_write(self):
+        """Write the pending records to the trace file, one batch at a time."""
+        try:
+            while self._lines:
+                lines, self._lines = self._lines, []
+                await self.hass.async_add_executor_job(self._write, lines)
+        finally:
+            self._writing = False
+
+    def _write(self, lines):
+        """Append lines to the trace file."""
+        with open(self.path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+# =========================================================================== #
+#                                                                             #
+#                                Service calls                                #
+#                                                                             #
+# =========================================================================== #
+class CastServiceCall(namedtuple('CastServiceCall', ['domain', 'service', 'entity_ids', 'data'])):
+    """An immutable, hashable service call.
+
+    ``entity_ids`` is a tuple of entity IDs and ``data`` is a sorted tuple of the ``(key, value)`` pairs in the
+    service data (apart from the entity IDs).
+
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def create(cls, domain, service, entity_ids, **data):
+        """Create a service call targeting an entity ID or an iterable of entity IDs."""
+        return cls(domain, service, (entity_ids,) if isinstance(entity_ids, str) else tuple(entity_ids), tuple(sorted(data.items())))
+
+    @property
+    def object_ids(self):
+        """The object IDs of the devices targeted by the service call."""
+        return {entity_id.split('.', 1)[-1] for entity_id in self.entity_ids}
+
+    def data_dict(self):
+        """Get the service data, including the entity IDs, as a dictionary."""
+        return dict(self.data, **{ATTR_ENTITY_ID: list(self.entity_ids)})
+
 
 # =========================================================================== #
 #                                                                             #
@@ -53,6 +272,8 @@ SERVICE_VOLUME_SET_SCHEMA = vol.Schema({
 class CastVolumeTracker(object):
     """A class for storing information about a cast device."""
 
+    __slots__ = ('cast_network', 'object_id', 'media_player', '_cast_is_on', '_cast_volume_level', '_is_volume_muted', '_value', '_expected_volume_level', '_state_attributes', 'groups', 'parents', 'parents_on_count', 'children', 'pending_volume_levels', 'statistics')
+
     def __init__(self, cast_network, object_id, cast_is_on, value, is_volume_muted):
         self.cast_network = cast_network
         self.object_id = object_id
@@ -60,22 +281,155 @@ class CastVolumeTracker(object):
         # associated media player
         self.media_player = '{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id)
 
-        self.cast_is_on = cast_is_on
-        self.cast_volume_level = None
+        self._cast_is_on = cast_is_on
+        self._cast_volume_level = None
+
+        self._is_volume_muted = is_volume_muted
+        self._value = value
+
+        # cached values that are cleared/re-computed whenever an attribute changes
+        self._expected_volume_level = 0. if is_volume_muted else 0.01 * value
+        self._state_attributes = None
+
+        # groups that have this tracker as a member
+        self.groups = []
+
+        # groups that take control of this tracker when they are on (object IDs), and the number of them that are on
+        self.parents = []
+        self.parents_on_count = 0
+
+        # trackers that have this tracker as a parent
+        self.children = []
+
+        # `(volume_level, deadline)` pairs for the volume commands whose echoes have not yet been received
+        self.pending_volume_levels = []
+
+        self.statistics = CastVolumeTrackerStatistics()
+
+    def _set_member_attribute(self, name, val):
+        """Set an attribute that is aggregated by the groups to which this tracker belongs."""
+        for group in self.groups:
+            group.remove_member(self)
+
+        setattr(self, name, val)
 
-        self.is_volume_muted = is_volume_muted
-        self.value = value
+        for group in self.groups:
+            group.add_member(self)
 
-        self.cast_network.casts[object_id] = self
+        self._attributes_changed()
+
+    def _attributes_changed(self):
+        """Clear the cached state attributes and record that the tracker's entity needs to be written."""
+        self._state_attributes = None
+        self.cast_network.changed.add(self.object_id)
+
+    @property
+    def cast_is_on(self):
+        """Whether or not the cast device is on."""
+        return self._cast_is_on
+
+    @cast_is_on.setter
+    def cast_is_on(self, cast_is_on):
+        if cast_is_on == self._cast_is_on:
+            return
+
+        self._set_member_attribute('_cast_is_on', cast_is_on)
+
+        for child in self.children:
+            child.parents_on_count += 1 if cast_is_on else -1
+
+    @property
+    def cast_volume_level(self):
+        """The volume level reported by the media player."""
+        return self._cast_volume_level
+
+    @cast_volume_level.setter
+    def cast_volume_level(self, cast_volume_level):
+        if cast_volume_level != self._cast_volume_level:
+            self._cast_volume_level = cast_volume_level
+            self._attributes_changed()
+
+    @property
+    def is_volume_muted(self):
+        """Whether or not the volume is muted."""
+        return self._is_volume_muted
+
+    @is_volume_muted.setter
+    def is_volume_muted(self, is_volume_muted):
+        if is_volume_muted != self._is_volume_muted:
+            self._expected_volume_level = 0. if is_volume_muted else 0.01 * self._value
+            self._set_member_attribute('_is_volume_muted', is_volume_muted)
+
+    @property
+    def value(self):
+        """The desired volume level (0 - 100)."""
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if value != self._value:
+            self._expected_volume_level = 0. if self._is_volume_muted else 0.01 * value
+            self._set_member_attribute('_value', value)
 
     @property
     def state_attributes(self):
-        """Return the state attributes."""
-        return {'cast_is_on': self.cast_is_on,
-                'value': self.value,
-                'volume_level': self.cast_volume_level,
-                'expected_volume_level': self.expected_volume_level,
-                'is_volume_muted': self.is_volume_muted}
+        """Return the state attributes (cached until one of them changes)."""
+        if self._state_attributes is None:
+            self._state_attributes = {'cast_is_on': self._cast_is_on,
+                                      'value': self._value,
+                                      'volume_level': self._cast_volume_level,
+                                      'expected_volume_level': self._expected_volume_level,
+                                      'is_volume_muted': self._is_volume_muted}
+
+        return self._state_attributes
+
+    def expect_volume_level(self, volume_level):
+        """Record that the media player has been told to change its volume to ``volume_level``.
+
+        Expired commands are discarded, and only the most recent ``MAX_PENDING_VOLUME_LEVELS`` commands are kept, so
+        that the list doesn't grow while the media player isn't reporting its state.
+
+        """
+        now = self.cast_network.clock()
+
+        # the deadlines are in ascending order, so the expired commands are at the start of the list
+        expired = 0
+        for _, deadline in self.pending_volume_levels:
+            if deadline >= now:
+                break
+            expired += 1
+
+        del self.pending_volume_levels[:max(expired, len(self.pending_volume_levels) + 1 - MAX_PENDING_VOLUME_LEVELS)]
+        self.pending_volume_levels.append((round(volume_level, 3), now + ECHO_TIMEOUT))
+
+    def consume_echo(self, cast_volume_level):
+        """Whether or not ``cast_volume_level`` is the echo of a volume command sent by this tracker.
+
+        The matching command and any commands that were sent before it are discarded, as are expired commands.
+
+        """
+        if not self.pending_volume_levels:
+            return False
+
+        now = self.cast_network.clock()
+        cast_volume_level = round(cast_volume_level, 3)
+        for i, (volume_level, deadline) in enumerate(self.pending_volume_levels):
+            if volume_level == cast_volume_level and deadline >= now:
+                del self.pending_volume_levels[:i + 1]
+                return True
+
+        self.pending_volume_levels = [(volume_level, deadline) for volume_level, deadline in self.pending_volume_levels if deadline >= now]
+        return False
+
+    def _media_player_volume_set(self):
+        """Set the media player volume to the expected level."""
+        self.expect_volume_level(self.expected_volume_level)
+        return [CastServiceCall.create(MEDIA_PLAYER_DOMAIN, SERVICE_VOLUME_SET, self.media_player, **{ATTR_MEDIA_VOLUME_LEVEL: self.expected_volume_level})]
+
+    @property
+    def parent_is_on(self):
+        """Whether or not a parent group is playing."""
+        return self.parents_on_count > 0
 
     @property
     def equilibrium(self):
@@ -85,40 +439,58 @@ class CastVolumeTracker(object):
     @property
     def expected_volume_level(self):
         """The expected cast volume level, based on ``self.value`` and ``self.is_volume_muted``."""
-        return 0. if self.is_volume_muted else 0.01 * self.value
+        return self._expected_volume_level
 
     def update(self, hass):
         """Update the cast volume tracker."""
-        cast_state_obj = hass.states.get(self.media_player)
-        if cast_state_obj:
-            if cast_state_obj.state is None:
-                return []
-            cast_is_on = cast_state_obj.state in CAST_ON_STATES
-            cast_volume_level = cast_state_obj.attributes.get(ATTR_MEDIA_VOLUME_LEVEL)
-        else:
-            return []
+        return self.update_state(hass.states.get(self.media_player))
+
+    def update_state(self, cast_state_obj):
+        """Update the cast volume tracker from the state of its media player."""
+        return self._record_update_state(cast_state_obj)[1]
 
+    def _record_update_state(self, cast_state_obj):
+        """Update the cast volume tracker, record the update in its statistics, and return the transition and the service calls."""
+        if not cast_state_obj or cast_state_obj.state is None:
+            return None, []
+
+        start = time.perf_counter()
+        transition, service_args = self._update_state(cast_state_obj.state in CAST_ON_STATES, cast_state_obj.attributes.get(ATTR_MEDIA_VOLUME_LEVEL))
+        self.statistics.record_update(self, transition, time.perf_counter() - start, service_args)
+
+        return transition, service_args
+
+    def _update_state(self, cast_is_on, cast_volume_level):
+        """Update the cast volume tracker and return the transition and the service calls."""
         # Off -> Off
         if not self.cast_is_on and not cast_is_on:
+            if cast_volume_level is not None:
+                self.consume_echo(cast_volume_level)
             self.cast_volume_level = cast_volume_level
-            return []
+            return TRANSITION_NONE, []
 
         # Off -> On
         if not self.cast_is_on and cast_is_on:
-            return self._update_off_to_on(cast_volume_level)
+            return TRANSITION_OFF_TO_ON, self._update_off_to_on(cast_volume_level)
 
         # On -> Off
         if self.cast_is_on and not cast_is_on:
-            return self._update_on_to_off(cast_volume_level)
+            return TRANSITION_ON_TO_OFF, self._update_on_to_off(cast_volume_level)
 
         # On -> On and volume changed
         if cast_volume_level is not None and round(self.expected_volume_level, 3) != round(cast_volume_level, 3):
-            return self._update_on_to_on(cast_volume_level)
+            # the media player is reporting a volume level that was set by this tracker
+            if self.consume_echo(cast_volume_level):
+                self.cast_volume_level = cast_volume_level
+                return TRANSITION_ECHO, []
+
+            return TRANSITION_ON_TO_ON, self._update_on_to_on(cast_volume_level)
 
         if cast_volume_level is not None:
+            self.consume_echo(cast_volume_level)
             self.cast_volume_level = cast_volume_level
 
-        return []
+        return TRANSITION_NONE, []
 
     def _update_on_to_off(self, cast_volume_level):
         return []
@@ -155,7 +527,18 @@ class CastVolumeTracker(object):
 #                                                                             #
 # =========================================================================== #
 class CastVolumeTrackerGroup(CastVolumeTracker):
-    """A class for storing information about a Chromecast group."""
+    """A class for storing information about a Chromecast group, whose members may be speakers or other groups.
+
+    Changes to the members are applied directly to their trackers, rather than via ``cast_volume_tracker`` service
+    calls, so only the resulting ``media_player`` service calls are returned.
+
+    """
+
+    __slots__ = ('members', 'members_when_off', '_members_when_off_set', 'value_sum', 'on_count', 'on_value_sum', 'muted_count', 'member_casts', 'descendants')
+
+    # groups don't have a default volume level, and they are muted when they are off
+    default_value = None
+    mute_when_off = True
 
     def __init__(self, cast_network, object_id, cast_is_on, value, is_volume_muted, members, members_excluded_when_off=None):
         super().__init__(cast_network, object_id, cast_is_on, value, is_volume_muted)
@@ -166,54 +549,118 @@ class CastVolumeTrackerGroup(CastVolumeTracker):
             self.members_when_off = members
         else:
             self.members_when_off = [member for member in members if member not in members_excluded_when_off]
-
-        # cast volume trackers
-        self.cast_volume_trackers = [ENTITY_ID_FORMAT.format(member) for member in members]
-        self.cast_volume_trackers_with_default = [ENTITY_ID_FORMAT.format(member) for member in members if self.cast_network.casts[member].default_value is not None]
-        self.cast_volume_trackers_without_default = [ENTITY_ID_FORMAT.format(member) for member in members if self.cast_network.casts[member].default_value is None]
+        self._members_when_off_set = set(self.members_when_off)
+
+        # running aggregates over the group members, updated whenever a member changes
+        self.value_sum = 0.  # sum of `value` for `members_when_off`
+        self.on_count = 0  # number of `members_when_off` that are on
+        self.on_value_sum = 0.  # sum of `value` for the `members_when_off` that are on
+        self.muted_count = 0  # number of `members` that are muted
+
+        # the members' trackers and the trackers of every group/speaker below this group (members before their members)
+        self.member_casts = [self.cast_network.casts[member] for member in members]
+        self.descendants = []
+        for member in self.member_casts:
+            for cast in [member] + getattr(member, 'descendants', []):
+                if cast not in self.descendants:
+                    self.descendants.append(cast)
+
+        self.cast_network.add(self)
+
+    def add_member(self, member):
+        """Add a member's attributes to the running aggregates."""
+        if member.object_id in self._members_when_off_set:
+            self.value_sum += member.value
+            if member.cast_is_on:
+                self.on_count += 1
+                self.on_value_sum += member.value
+
+        if member.is_volume_muted:
+            self.muted_count += 1
+
+    def remove_member(self, member):
+        """Remove a member's attributes from the running aggregates."""
+        if member.object_id in self._members_when_off_set:
+            self.value_sum -= member.value
+            if member.cast_is_on:
+                self.on_count -= 1
+                self.on_value_sum -= member.value
+
+        if member.is_volume_muted:
+            self.muted_count -= 1
+
+    def average_value_when_off(self):
+        """The average ``value`` of ``members_when_off``, i.e., the ``value`` that this group will have when it turns on.
+
+        A group's ``value`` isn't updated from its members while it is off, so member groups that are off contribute
+        their own ``average_value_when_off()`` instead.
+
+        """
+        value_sum = self.value_sum
+        for member in self.member_casts:
+            if isinstance(member, CastVolumeTrackerGroup) and not member.cast_is_on and member.object_id in self._members_when_off_set:
+                value_sum += member.average_value_when_off() - member.value
+
+        return value_sum / len(self.members_when_off)
+
+    @staticmethod
+    def _volume_set(members, volume_level):
+        """Set the volume level for ``members`` and return the resulting service calls."""
+        service_args = []
+        for member in members:
+            service_args += member.volume_set(volume_level)
+
+        return service_args
 
     def _update_off_to_on(self, cast_volume_level):
+        if self.parent_is_on:
+            self.cast_volume_level = cast_volume_level
+            return []
+
         self.cast_is_on = True
         self.is_volume_muted = False
-        self.value = sum([self.cast_network.casts[member].value for member in self.members_when_off]) / len(self.members_when_off)
+        self.value = round(self.average_value_when_off(), VALUE_DIGITS)
         self.cast_volume_level = self.expected_volume_level
 
-        # set the `cast_is_on` and `is_volume_muted` attributes for the speakers in the group
-        for member in self.members:
-            self.cast_network.casts[member].set_attributes(True, is_volume_muted=False)
+        # set the `cast_is_on` and `is_volume_muted` attributes for the groups and speakers in the group
+        for cast in self.descendants:
+            cast.set_attributes(True, is_volume_muted=False)
 
-        # 1) Set the cast volume tracker volumes
-        return [[DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: self.cast_volume_trackers, ATTR_MEDIA_VOLUME_LEVEL: 0.01*self.value}]]
+        # 1) Set the member volumes
+        return self._volume_set(self.member_casts, 0.01*self.value)
 
     def _update_on_to_off(self, cast_volume_level):
-        self.cast_is_on = False
         self.cast_volume_level = cast_volume_level
+        if self.parent_is_on:
+            return []
+
+        self.cast_is_on = False
         self.is_volume_muted = True
 
-        # set the `cast_is_on` and `is_volume_muted` attributes for the speakers in the group
-        for member in self.members:
-            self.cast_network.casts[member].set_attributes(False, is_volume_muted=self.cast_network.casts[member].mute_when_off)
+        # set the `cast_is_on` and `is_volume_muted` attributes for the groups and speakers in the group
+        for cast in self.descendants:
+            cast.set_attributes(False, is_volume_muted=cast.mute_when_off)
 
-        # 1) Set the cast volume tracker volumes for members without default values
-        # 2) Set the cast volume tracker volumes for members with default values
-        return [[DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: self.cast_volume_trackers_without_default, ATTR_MEDIA_VOLUME_LEVEL: 0.01*self.value}]] + [[DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: member, ATTR_MEDIA_VOLUME_LEVEL: 0.01*self.cast_network.casts[member.replace(DOMAIN + '.', '')].default_value}] for member in self.cast_volume_trackers_with_default]
+        # 1) Set the volumes for members without default values
+        # 2) Set the volumes for members with default values
+        return self._volume_set([member for member in self.member_casts if member.default_value is None], 0.01*self.value) + [args for member in self.member_casts if member.default_value is not None for args in member.volume_set(0.01*member.default_value)]
 
     def _update_on_to_on(self, cast_volume_level):
-        if not self.equilibrium:
+        if self.parent_is_on or not self.equilibrium:
             return []
 
         self.cast_volume_level = cast_volume_level
 
-        if all([self.cast_network.casts[member].is_volume_muted for member in self.members]):
+        if self.muted_count == len(self.members):
             self.is_volume_muted = True
         else:
             self.is_volume_muted = False
 
         if not self.is_volume_muted:
-            self.value = 100.*self.cast_volume_level * len(self.members) / sum([not self.cast_network.casts[member].is_volume_muted for member in self.members])
+            self.value = 100.*self.cast_volume_level * len(self.members) / (len(self.members) - self.muted_count)
 
-        # 1) Set the cast volume trackers
-        return [[DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: self.cast_volume_trackers, ATTR_MEDIA_VOLUME_LEVEL: 0.01*self.value}]]*2
+        # 1) Set the member volumes
+        return self._volume_set(self.member_casts, 0.01*self.value)
 
     def volume_mute(self, is_volume_muted):
         """Mute/Un-mute the volume for the group members."""
@@ -223,28 +670,28 @@ class CastVolumeTrackerGroup(CastVolumeTracker):
         if is_volume_muted ^ self.is_volume_muted:
             self.set_attributes(is_volume_muted=is_volume_muted)
 
-            # 1) Mute the cast volume trackers
-            return [[DOMAIN, SERVICE_VOLUME_MUTE, {ATTR_ENTITY_ID: self.cast_volume_trackers, ATTR_MEDIA_VOLUME_MUTED: is_volume_muted}]]
+            # 1) Mute the members
+            return [args for member in self.member_casts for args in member.volume_mute(is_volume_muted)]
 
         return []
 
     def volume_set(self, volume_level):
         """Set the volume level for the group members."""
         if not self.cast_is_on:
-            off_cast_volume_trackers = [ENTITY_ID_FORMAT.format(member) for member in self.members_when_off if not self.cast_network.casts[member].cast_is_on]
+            off_members = [member for member in self.member_casts if member.object_id in self._members_when_off_set and not member.cast_is_on]
 
-            if not off_cast_volume_trackers:
+            if not off_members:
                 return []
 
-            new_value = (100.*volume_level*len(off_cast_volume_trackers) + sum([self.cast_network.casts[member].value for member in self.members_when_off if self.cast_network.casts[member].cast_is_on])) / len(self.members_when_off)
+            new_value = round((100.*volume_level*len(off_members) + self.on_value_sum) / len(self.members_when_off), VALUE_DIGITS)
             self.set_attributes(value=new_value)
 
-            return [[DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: off_cast_volume_trackers, ATTR_MEDIA_VOLUME_LEVEL: volume_level}]]
+            return self._volume_set(off_members, volume_level)
 
         self.set_attributes(value=100.*volume_level)
 
-        # 1) Set the cast volume tracker volumes
-        return [[DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: self.cast_volume_trackers, ATTR_MEDIA_VOLUME_LEVEL: volume_level}]]
+        # 1) Set the member volumes
+        return self._volume_set(self.member_casts, volume_level)
 
 
 # =========================================================================== #
@@ -255,13 +702,13 @@ class CastVolumeTrackerGroup(CastVolumeTracker):
 class CastVolumeTrackerIndividual(CastVolumeTracker):
     """A class for storing information about an individual Chromecast speaker."""
 
+    __slots__ = ('mute_when_off', 'default_value')
+
     def __init__(self, cast_network, object_id, cast_is_on, value, is_volume_muted, parents=None, mute_when_off=True, default_volume_level=None):
         super().__init__(cast_network, object_id, cast_is_on, value, is_volume_muted)
 
         # groups to which this speaker belongs
-        if parents is None:
-            self.parents = []
-        else:
+        if parents is not None:
             self.parents = parents
 
         # mute the volume when this speaker turns off
@@ -273,10 +720,7 @@ class CastVolumeTrackerIndividual(CastVolumeTracker):
         else:
             self.default_value = None
 
-    @property
-    def parent_is_on(self):
-        """Whether or not a parent group is playing."""
-        return any([self.cast_network.casts[parent].cast_is_on for parent in self.parents])
+        self.cast_network.add(self)
 
     def _update_off_to_on(self, cast_volume_level):
         if self.parent_is_on:
@@ -288,7 +732,7 @@ class CastVolumeTrackerIndividual(CastVolumeTracker):
         self.cast_volume_level = self.expected_volume_level
 
         # 1) Set the media player volume
-        return [[MEDIA_PLAYER_DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: self.media_player, ATTR_MEDIA_VOLUME_LEVEL: self.expected_volume_level}]]
+        return self._media_player_volume_set()
 
     def _update_on_to_off(self, cast_volume_level):
         self.cast_volume_level = cast_volume_level
@@ -302,7 +746,7 @@ class CastVolumeTrackerIndividual(CastVolumeTracker):
             self.value = self.default_value
 
         # 1) Set the media player volume
-        return [[MEDIA_PLAYER_DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: self.media_player, ATTR_MEDIA_VOLUME_LEVEL: self.expected_volume_level}]]
+        return self._media_player_volume_set()
 
     def _update_on_to_on(self, cast_volume_level):
         self.cast_volume_level = cast_volume_level
@@ -313,7 +757,7 @@ class CastVolumeTrackerIndividual(CastVolumeTracker):
             self.value = 100.*self.cast_volume_level
 
         # 1) Set the media player volume
-        return [[MEDIA_PLAYER_DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: self.media_player, ATTR_MEDIA_VOLUME_LEVEL: self.expected_volume_level}]]
+        return self._media_player_volume_set()
 
     def volume_mute(self, is_volume_muted):
         """Mute/Un-mute the volume."""
@@ -321,7 +765,7 @@ class CastVolumeTrackerIndividual(CastVolumeTracker):
             self.set_attributes(is_volume_muted=is_volume_muted)
 
             # 1) Set the media player volume
-            return [[MEDIA_PLAYER_DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: self.media_player, ATTR_MEDIA_VOLUME_LEVEL: self.expected_volume_level}]]
+            return self._media_player_volume_set()
 
         return []
 
@@ -330,7 +774,7 @@ class CastVolumeTrackerIndividual(CastVolumeTracker):
         self.set_attributes(value=100.*volume_level)
 
         # 1) Set the media player volume
-        return [[MEDIA_PLAYER_DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: self.media_player, ATTR_MEDIA_VOLUME_LEVEL: self.expected_volume_level}]]
+        return self._media_player_volume_set()
 
 
 # =========================================================================== #
@@ -341,11 +785,528 @@ class CastVolumeTrackerIndividual(CastVolumeTracker):
 class CastNetwork(object):
     """A class for tracking and controlling cast devices."""
 
-    def __init__(self):
+    def __init__(self, clock=time.monotonic):
         self.casts = {}
 
+        # the clock used for echo deadlines
+        self.clock = clock
+
+        # cast volume tracker entities
+        self.entities = {}
+
+        # topology index
+        self.groups = {}  # member object ID -> object IDs of the groups that contain it
+        self.object_ids = {}  # media player / cast volume tracker entity ID -> object ID
+        self.rank = {}  # object ID -> position in the topological order (groups before their members)
+
+        # object IDs of the trackers that need to be re-evaluated
+        self.dirty = set()
+        self._update_scheduled = False
+
+        # object IDs of the trackers whose `value` and `is_volume_muted` attributes were restored from the snapshot
+        self.restored = set()
+
+        # object IDs of the trackers whose attributes have changed since their entities were last written
+        self.changed = set()
+
+        # `value` and `is_volume_muted` attributes saved by the `snapshot` service (object ID -> tuple)
+        self.saved_volumes = {}
+
+    def add(self, cast):
+        """Add a cast volume tracker to the network and link it with its groups, members, parents, and children."""
+        object_id = cast.object_id
+        self.casts[object_id] = cast
+        self.object_ids[cast.media_player] = object_id
+        self.object_ids[ENTITY_ID_FORMAT.format(object_id)] = object_id
+        self.groups.setdefault(object_id, [])
+
+        if isinstance(cast, CastVolumeTrackerGroup):
+            for member in cast.member_casts:
+                self.groups.setdefault(member.object_id, []).append(object_id)
+                member.groups.append(cast)
+                cast.add_member(member)
+
+                # a group that is a member of this group is controlled by it when it is on
+                if isinstance(member, CastVolumeTrackerGroup) and object_id not in member.parents:
+                    member.parents.append(object_id)
+
+            for other in self.casts.values():
+                if object_id in other.parents:
+                    self._link_parent(cast, other)
+
+        else:
+            for parent in cast.parents:
+                if parent in self.casts:
+                    self._link_parent(self.casts[parent], cast)
+
+        self._sort()
+
+    @staticmethod
+    def _link_parent(parent, child):
+        """Link a tracker with one of the groups in its ``parents`` list."""
+        parent.children.append(child)
+        if parent.cast_is_on:
+            child.parents_on_count += 1
+
+    def _sort(self):
+        """Rank the trackers so that each group is evaluated before its members."""
+        order = []
+        visited = set()
+
+        def visit(object_id):
+            if object_id in visited:
+                return
+            visited.add(object_id)
+            for group in self.groups.get(object_id, []):
+                visit(group)
+            order.append(object_id)
+
+        for object_id in self.casts:
+            visit(object_id)
+
+        self.rank = {object_id: i for i, object_id in enumerate(order)}
+
+    def snapshot(self):
+        """Get a compact snapshot of the trackers: ``{object_id: [value, is_volume_muted, default_value]}``."""
+        return {object_id: [cast.value, cast.is_volume_muted, getattr(cast, 'default_value', None)] for object_id, cast in self.casts.items()}
+
+    def copy(self):
+        """Get a deep copy of the network that is detached from the tracker entities."""
+        return copy.deepcopy(self, {id(self.clock): self.clock, id(self.entities): {}})
+
+    def plan(self, states=None, volume_levels=None, is_volume_muted=None):
+        """Calculate the outcome of media player state changes and volume commands without changing the trackers.
+
+        The changes are applied to a copy of the network in this order: the media player ``states`` (media player
+        entity ID -> ``State``), as for :meth:`update`; the ``volume_levels`` (cast volume tracker entity ID -> volume
+        level), as for :meth:`volume_set_many`; and the ``is_volume_muted`` attributes (cast volume tracker entity ID
+        -> bool), in topological order.
+
+        Returns
+        -------
+        network : CastNetwork
+            The copy of the network, with the changes applied
+        service_args : list
+            The coalesced ``CastServiceCall`` objects for the service calls that would be performed
+
+        """
+        network = self.copy()
+        service_args = []
+
+        if states:
+            for entity_id in sorted(states, key=lambda entity_id: network.rank[network.object_ids[entity_id]]):
+                service_args += network.casts[network.object_ids[entity_id]].update_state(states[entity_id])
+
+        if volume_levels:
+            for _, cast_service_args in network.volume_set_many(volume_levels):
+                service_args += cast_service_args
+
+        if is_volume_muted:
+            for entity_id in sorted(is_volume_muted, key=lambda entity_id: network.rank[network.object_ids[entity_id]]):
+                service_args += network.casts[network.object_ids[entity_id]].volume_mute(is_volume_muted[entity_id])
+
+        return network, coalesce_service_calls(service_args)[0]
+
+    def mark_dirty(self, entity_id):
+        """Mark the tracker for a media player or cast volume tracker entity as needing to be re-evaluated."""
+        object_id = self.object_ids.get(entity_id)
+        if object_id is not None:
+            self.dirty.add(object_id)
+
+    def volume_set_many(self, volume_levels):
+        """Set the volume levels of several trackers (entity ID -> volume level) in one pass.
+
+        The trackers are set in topological order, so a level for a speaker takes precedence over a level for one of
+        its groups.  When a media player is set more than once, only the last of its ``volume_set`` calls is kept.
+
+        Returns
+        -------
+        list
+            A list of ``(cast, service_args)`` tuples
+
+        """
+        results = []
+        for object_id in sorted((self.object_ids[entity_id] for entity_id in volume_levels), key=self.rank.__getitem__):
+            cast = self.casts[object_id]
+            results.append((cast, cast.volume_set(volume_levels[ENTITY_ID_FORMAT.format(object_id)])))
+
+        # the index of the last call for each media player
+        last = {(args.domain, args.service, args.entity_ids): (i, j) for i, (_, service_args) in enumerate(results) for j, args in enumerate(service_args)}
+
+        return [(cast, [args for j, args in enumerate(service_args) if last[args.domain, args.service, args.entity_ids] == (i, j)]) for i, (cast, service_args) in enumerate(results)]
+
+    def _with_descendants(self, object_ids):
+        """Get ``object_ids`` plus the object IDs of the trackers below any groups among them."""
+        expanded = set(object_ids)
+        for object_id in object_ids:
+            expanded.update(cast.object_id for cast in getattr(self.casts[object_id], 'descendants', []))
+
+        return expanded
+
+    def save_volumes(self, object_ids=None):
+        """Save the ``value`` and ``is_volume_muted`` attributes of the trackers (default: all) and their members."""
+        for object_id in self._with_descendants(self.casts if object_ids is None else object_ids):
+            cast = self.casts[object_id]
+            self.saved_volumes[object_id] = (cast.value, cast.is_volume_muted)
+
+    def restore_volumes(self, object_ids=None):
+        """Restore the saved attributes of the trackers (default: all) and their members.
+
+        The attributes are restored in topological order, but groups don't pass their restored volume levels on to
+        their members, which are restored from their own saved attributes.  A ``media_player.volume_set`` call is made
+        only for speakers whose expected volume level changed or whose media player is not at it.
+
+        Returns
+        -------
+        list
+            A list of ``(cast, service_args)`` tuples
 
-CN = CastNetwork()
+        """
+        object_ids = self._with_descendants(self.saved_volumes if object_ids is None else object_ids)
+
+        results = []
+        for object_id in sorted((object_id for object_id in object_ids if object_id in self.saved_volumes), key=self.rank.__getitem__):
+            cast = self.casts[object_id]
+            expected_volume_level = cast.expected_volume_level
+            value, is_volume_muted = self.saved_volumes[object_id]
+            cast.set_attributes(value=value, is_volume_muted=is_volume_muted)
+
+            if isinstance(cast, CastVolumeTrackerIndividual) and (cast.expected_volume_level != expected_volume_level or (cast.cast_volume_level is not None and not cast.equilibrium)):
+                results.append((cast, cast._media_player_volume_set()))
+
+        return results
+
+    def update(self, hass):
+        """Re-evaluate the dirty trackers in topological order.
+
+        Returns
+        -------
+        list
+            A list of ``(cast, cast_is_on, service_args)`` tuples, where ``cast_is_on`` is the tracker's
+            ``cast_is_on`` attribute prior to the update
+
+        """
+        dirty = sorted(self.dirty, key=self.rank.__getitem__)
+        self.dirty.clear()
+
+        results = []
+        for object_id in dirty:
+            cast = self.casts[object_id]
+            cast_is_on = cast.cast_is_on
+            results.append((cast, cast_is_on, cast.update(hass)))
+
+        return results
+
+    def reconcile(self, hass):
+        """Re-evaluate every tracker against a single snapshot of the media player states.
+
+        The media player states are read in one pass, and then every tracker is updated from that snapshot in
+        topological order, so the result is the same as marking every tracker dirty and calling :meth:`update`.  Trackers
+        that stayed off, or stayed on at the expected volume level, are left out of the results unless their volume
+        level or (for the members of a group that turned on or off) their attributes changed.
+
+        Returns
+        -------
+        list
+            A list of ``(cast, cast_is_on, service_args)`` tuples for the trackers that changed
+
+        """
+        snapshot = {state.entity_id: state for state in hass.states.async_all() if state.entity_id in self.object_ids}
+
+        results = []
+        touched = set()
+        for cast in sorted(self.casts.values(), key=lambda cast: self.rank[cast.object_id]):
+            cast_is_on = cast.cast_is_on
+            cast_volume_level = cast.cast_volume_level
+            transition, service_args = cast._record_update_state(snapshot.get(cast.media_player))
+            if transition is None:
+                continue
+
+            if transition != TRANSITION_NONE or cast.object_id in touched or cast.cast_volume_level != cast_volume_level:
+                results.append((cast, cast_is_on, service_args))
+
+            # a group that turned on or off has changed the attributes of the trackers below it
+            if cast.cast_is_on != cast_is_on:
+                touched.update(descendant.object_id for descendant in getattr(cast, 'descendants', []))
+
+        return results
+
+    @callback
+    def async_schedule_update(self, hass):
+        """Schedule the dirty trackers to be re-evaluated."""
+        if not self._update_scheduled:
+            self._update_scheduled = True
+            hass.async_create_task(self.async_update(hass))
+
+    async def async_update(self, hass):
+        """Re-evaluate the dirty trackers, perform the resulting service calls, and update their entities."""
+        self._update_scheduled = False
+        await self._async_apply(hass, self.update(hass))
+
+    async def async_reconcile(self, hass):
+        """Reconcile every tracker, perform the resulting service calls, and update their entities."""
+        self.dirty.clear()
+        await self._async_apply(hass, self.reconcile(hass))
+
+    async def async_volume_set_many(self, hass, volume_levels):
+        """Set the volume levels of several trackers, perform the service calls in one batch, and update the entities."""
+        await self._async_dispatch(hass, self.volume_set_many(volume_levels))
+
+    async def async_restore_volumes(self, hass, object_ids=None):
+        """Restore the saved attributes of the trackers, perform the service calls in one batch, and update the entities."""
+        await self._async_dispatch(hass, self.restore_volumes(object_ids))
+
+    async def _async_dispatch(self, hass, results):
+        """Perform the service calls from a list of ``(cast, service_args)`` tuples in one batch and update the entities."""
+        for cast, service_args in results:
+            entity = self.entities.get(cast.object_id)
+            if entity:
+                entity.record_service_calls(service_args)
+
+        start = time.perf_counter()
+        await async_perform_service_calls(hass, [args for _, service_args in results for args in service_args])
+        elapsed = time.perf_counter() - start
+
+        for cast, service_args in results:
+            cast.statistics.record_dispatch(elapsed, service_args)
+
+        await self.async_write_changed()
+
+    async def _async_apply(self, hass, results):
+        """Perform the service calls resulting from an update and update the trackers' entities."""
+        for cast, cast_is_on, service_args in results:
+            entity = self.entities.get(cast.object_id)
+            if entity:
+                entity.record_decision(cast_is_on)
+                entity.record_service_calls(service_args)
+
+        start = time.perf_counter()
+        await async_perform_service_calls(hass, [args for _, _, service_args in results for args in service_args])
+        elapsed = time.perf_counter() - start
+
+        # the service calls are performed as a batch, so each tracker that contributed to it is charged for all of it
+        for cast, _, service_args in results:
+            if service_args:
+                cast.statistics.dispatch_time += elapsed
+
+        for cast, cast_is_on, _ in results:
+            entity = self.entities.get(cast.object_id)
+            if entity:
+                await entity.async_cast_updated(cast_is_on)
+
+        await self.async_write_changed()
+
+    async def async_write_changed(self):
+        """Write the state of every tracker entity whose attributes have changed (e.g., the members of a group)."""
+        changed, self.changed = self.changed, set()
+        for object_id in sorted(changed, key=self.rank.__getitem__):
+            entity = self.entities.get(object_id)
+            if entity:
+                await entity.async_write_state_if_changed()
+
+
+# =========================================================================== #
+#                                                                             #
+#                            Service call dispatch                            #
+#                                                                             #
+# =========================================================================== #
+def coalesce_service_calls(service_args):
+    """Merge service calls that have the same service and payload and drop exact duplicates.
+
+    A call is merged into the most recent earlier call with the same domain, service, and data (apart from the
+    entity IDs), provided that no call in between targets any of the same devices.  The order of the calls for each
+    device is therefore unchanged.
+
+    Parameters
+    ----------
+    service_args : list
+        A list of ``CastServiceCall`` objects
+
+    Returns
+    -------
+    coalesced : list
+        The ``CastServiceCall`` objects for the service calls that need to be performed
+    saved : int
+        The number of service calls that were eliminated
+
+    """
+    coalesced = []
+    for args in service_args:
+        object_ids = args.object_ids
+        for i in range(len(coalesced) - 1, -1, -1):
+            other = coalesced[i]
+            if other.domain == args.domain and other.service == args.service and other.data == args.data:
+                coalesced[i] = other._replace(entity_ids=other.entity_ids + tuple(entity_id for entity_id in args.entity_ids if entity_id not in other.entity_ids))
+                break
+
+            if object_ids & other.object_ids:
+                coalesced.append(args)
+                break
+
+        else:
+            coalesced.append(args)
+
+    return coalesced, len(service_args) - len(coalesced)
+
+
+async def async_perform_service_calls(hass, service_args):
+    """Coalesce and perform the service calls."""
+    service_args, saved = coalesce_service_calls(service_args)
+    if saved:
+        _LOGGER.debug("Coalescing saved %d service call(s)", saved)
+
+    await async_dispatch_service_calls(hass, service_args)
+
+
+class VolumeSetQueue(object):
+    """A rate-limited, latest-wins queue of ``media_player.volume_set`` calls for one media player.
+
+    A call is sent immediately if at least ``interval`` seconds have passed since the previous one was sent;
+    otherwise it is held back until then, replacing any call that is already being held back.
+
+    """
+
+    def __init__(self, interval, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+
+        # the call that is being held back and the number of calls that it replaced
+        self.pending = None
+        self.superseded = 0
+
+        self._next_send = -math.inf
+        self._unsub = None
+
+    async def async_volume_set(self, hass, args):
+        """Send the call, or hold it back until the rate limit allows it to be sent."""
+        now = self.clock()
+        if self._unsub is None and now >= self._next_send:
+            self._next_send = now + self.interval
+            await hass.services.async_call(args.domain, args.service, args.data_dict(), blocking=True)
+            return
+
+        if self.pending is not None:
+            self.superseded += 1
+            _LOGGER.debug("%s: superseded a pending volume_set call (%d so far)", args.entity_ids[0], self.superseded)
+
+        self.pending = args
+        if self._unsub is None:
+            self._unsub = async_call_later(hass, max(self._next_send - now, 0.), self._async_send_pending(hass))
+
+    def _async_send_pending(self, hass):
+        """Get a job that sends the call that is being held back."""
+        async def async_send_pending(now):
+            """Send the call that is being held back."""
+            self._unsub = None
+            args, self.pending = self.pending, None
+            if args is not None:
+                self._next_send = self.clock() + self.interval
+                await hass.services.async_call(args.domain, args.service, args.data_dict(), blocking=True)
+
+        return async_send_pending
+
+
+async def _async_call(hass, args):
+    """Perform a ``CastServiceCall``, sending ``media_player.volume_set`` calls through their media players' queues."""
+    queues = hass.data.get(DATA_VOLUME_SET_QUEUES)
+    if not queues or args.domain != MEDIA_PLAYER_DOMAIN or args.service != SERVICE_VOLUME_SET:
+        await hass.services.async_call(args.domain, args.service, args.data_dict(), blocking=True)
+        return
+
+    queued = [entity_id for entity_id in args.entity_ids if entity_id in queues]
+    if not queued:
+        await hass.services.async_call(args.domain, args.service, args.data_dict(), blocking=True)
+        return
+
+    unqueued = tuple(entity_id for entity_id in args.entity_ids if entity_id not in queues)
+    if unqueued:
+        unqueued_args = args._replace(entity_ids=unqueued)
+        await hass.services.async_call(unqueued_args.domain, unqueued_args.service, unqueued_args.data_dict(), blocking=True)
+
+    for entity_id in queued:
+        await queues[entity_id].async_volume_set(hass, args._replace(entity_ids=(entity_id,)))
+
+
+async def _async_call_after(hass, predecessors, args):
+    """Perform a service call once the calls on which it depends are done."""
+    if predecessors:
+        await asyncio.wait(predecessors)
+
+    await _async_call(hass, args)
+
+
+async def async_dispatch_service_calls(hass, service_args):
+    """Perform service calls concurrently, preserving the order of calls that target the same device.
+
+    A service call waits for the most recent earlier call that targets any of the same devices.  Devices are
+    identified by their object ID, so ``cast_volume_tracker.kitchen_home`` and ``media_player.kitchen_home`` are
+    treated as the same device.  Calls that don't share a device are performed concurrently.  Each call is blocking,
+    i.e., it is done when its service handler is done, not when it has been scheduled.
+    """
+    if len(service_args) < 2:
+        for args in service_args:
+            await _async_call(hass, args)
+        return
+
+    last_task = {}
+    tasks = []
+    for args in service_args:
+        object_ids = args.object_ids
+        predecessors = {last_task[object_id] for object_id in object_ids if object_id in last_task}
+        task = hass.async_create_task(_async_call_after(hass, predecessors, args))
+
+        for object_id in object_ids:
+            last_task[object_id] = task
+        tasks.append(task)
+
+    await asyncio.gather(*tasks)
+
+
+# =========================================================================== #
+#                                                                             #
+#                           State change dispatcher                           #
+#                                                                             #
+# =========================================================================== #
+class StateChangeDispatcher(object):
+    """A single ``state_changed`` listener that routes events to the entities that subscribed to them."""
+
+    def __init__(self, hass):
+        self.hass = hass
+
+        # entity ID -> callbacks with the signature of an `async_track_state_change` action
+        self.subscribers = {}
+        self._unsub = None
+
+    @callback
+    def async_subscribe(self, entity_ids, action):
+        """Call ``action(entity_id, old_state, new_state)`` when the state of one of ``entity_ids`` changes.
+
+        Returns a callback that unsubscribes.
+
+        """
+        entity_ids = [entity_id.lower() for entity_id in ([entity_ids] if isinstance(entity_ids, str) else entity_ids)]
+        for entity_id in entity_ids:
+            self.subscribers.setdefault(entity_id, []).append(action)
+
+        if self._unsub is None:
+            self._unsub = self.hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed)
+
+        @callback
+        def async_unsubscribe():
+            """Remove the subscriptions."""
+            for entity_id in entity_ids:
+                self.subscribers[entity_id].remove(action)
+                if not self.subscribers[entity_id]:
+                    del self.subscribers[entity_id]
+
+        return async_unsubscribe
+
+    @callback
+    def _async_state_changed(self, event):
+        """Pass a state change to the entity's subscribers."""
+        entity_id = event.data.get(ATTR_ENTITY_ID)
+        for action in tuple(self.subscribers.get(entity_id, ())):
+            self.hass.async_run_job(action, entity_id, event.data.get('old_state'), event.data.get('new_state'))
 
 
 # =========================================================================== #
@@ -358,36 +1319,117 @@ def _cv_cast_volume_tracker(cfg):
     return cfg
 
 
+def _cv_cast_networks(trackers_config):
+    """Configure validation helper to make sure that groups and their members belong to the same network."""
+    for object_id, cfg in trackers_config.items():
+        for other in cfg.get(CONF_MEMBERS, []) + cfg[CONF_PARENTS]:
+            if other in trackers_config and trackers_config[other][CONF_NETWORK] != cfg[CONF_NETWORK]:
+                raise vol.Invalid("'{}' (network '{}') and '{}' (network '{}') must belong to the same network".format(object_id, cfg[CONF_NETWORK], other, trackers_config[other][CONF_NETWORK]))
+
+    return trackers_config
+
+
+def _cv_cast_groups(trackers_config):
+    """Configure validation helper to make sure that no group contains itself (directly or via other groups)."""
+    done = set()
+
+    def visit(object_id, path):
+        if object_id in path:
+            raise vol.Invalid("Cast volume tracker groups form a cycle: {}".format(' -> '.join(path[path.index(object_id):] + [object_id])))
+
+        if object_id in done:
+            return
+
+        for member in trackers_config.get(object_id, {}).get(CONF_MEMBERS, []):
+            visit(member, path + [object_id])
+
+        done.add(object_id)
+
+    for object_id in trackers_config:
+        visit(object_id, [])
+
+    return trackers_config
+
+
+def members_first(trackers_config):
+    """Get the object IDs in ``trackers_config``, ordered so that each group comes after its members."""
+    order = []
+
+    def visit(object_id):
+        if object_id in order or object_id not in trackers_config:
+            return
+
+        for member in trackers_config[object_id].get(CONF_MEMBERS, []):
+            visit(member)
+
+        order.append(object_id)
+
+    # individual speakers first
+    for object_id in sorted(trackers_config, key=lambda object_id: CONF_MEMBERS in trackers_config[object_id]):
+        visit(object_id)
+
+    return order
+
+
 CONFIG_SCHEMA = vol.Schema({
-    DOMAIN: cv.schema_with_slug_keys(
+    DOMAIN: vol.All(cv.schema_with_slug_keys(
         vol.All({
             vol.Required(CONF_NAME): cv.string,
             vol.Optional(CONF_PARENTS, default=list()): cv.ensure_list,
             vol.Optional(CONF_MEMBERS): cv.ensure_list,
             vol.Optional(CONF_MEMBERS_EXCLUDED_WHEN_OFF, default=list()): cv.ensure_list,
             vol.Optional(CONF_MUTE_WHEN_OFF, default=True): cv.boolean,
+            vol.Optional(CONF_NETWORK, default=DEFAULT_NETWORK): cv.string,
             vol.Optional(CONF_DEFAULT_VOLUME_LEVEL): vol.Coerce(float),
+            vol.Optional(CONF_COALESCE_WINDOW, default=0.): vol.All(vol.Coerce(float), vol.Range(min=0.)),
+            vol.Optional(CONF_STATISTICS, default=False): cv.boolean,
+            vol.Optional(CONF_TRACE): cv.string,
+            vol.Optional(CONF_VOLUME_SET_INTERVAL, default=0.): vol.All(vol.Coerce(float), vol.Range(min=0.)),
             vol.Optional(CONF_OFF_SCRIPT): cv.SCRIPT_SCHEMA,
             vol.Optional(CONF_ON_SCRIPT): cv.SCRIPT_SCHEMA
         }, _cv_cast_volume_tracker)
-    )
+    ), _cv_cast_groups, _cv_cast_networks)
 }, required=True, extra=vol.ALLOW_EXTRA)
 
 
-async def async_setup(hass, config):
-    """Set up a cast volume tracker."""
-    component = EntityComponent(_LOGGER, DOMAIN, hass)
+def partition_trackers(trackers_config):
+    """Split the (validated) configuration into one configuration per network."""
+    partitions = {}
+    for object_id, cfg in trackers_config.items():
+        partitions.setdefault(cfg[CONF_NETWORK], {})[object_id] = cfg
+
+    return partitions
+
 
+def create_entities(hass, cast_network, trackers_config, states, snapshot):
+    """Create the cast volume trackers in ``cast_network`` and their entities from the (validated) configuration.
+
+    ``states`` is a snapshot of the state machine (entity ID -> state) and ``snapshot`` is the stored snapshot of the
+    trackers (see :meth:`CastNetwork.snapshot`).
+
+    """
     entities = []
 
-    # setup individual speakers first
-    for object_id, cfg in sorted(config[DOMAIN].items(), key=lambda x: CONF_MEMBERS in x[1]):
+    # setup members before their groups
+    for object_id in members_first(trackers_config):
+        cfg = trackers_config[object_id]
         name = cfg.get(CONF_NAME)
         off_script = cfg.get(CONF_OFF_SCRIPT)
         on_script = cfg.get(CONF_ON_SCRIPT)
+        coalesce_window = cfg[CONF_COALESCE_WINDOW]
+        statistics = cfg[CONF_STATISTICS]
+
+        # trackers that are traced to the same file share a recorder
+        recorder = None
+        if CONF_TRACE in cfg:
+            path = hass.config.path(cfg[CONF_TRACE])
+            recorders = hass.data.setdefault(DATA_TRACE_RECORDERS, {})
+            if path not in recorders:
+                recorders[path] = CastVolumeTrackerTraceRecorder(hass, path, cast_network.clock)
+            recorder = recorders[path]
 
         # Get the `cast_is_on`, `value`, and `is_volume_muted` attributes from the media player
-        cast_state_obj = hass.states.get('{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id))
+        cast_state_obj = states.get('{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id))
         if cast_state_obj:
             cast_is_on = cast_state_obj.state in CAST_ON_STATES
             cast_volume_level = cast_state_obj.attributes.get(ATTR_MEDIA_VOLUME_LEVEL)
@@ -413,32 +1455,215 @@ async def async_setup(hass, config):
             else:
                 value = 0.
 
+        # The cast is off --> restore the `value` and `is_volume_muted` attributes from the snapshot
+        if not cast_is_on and object_id in snapshot:
+            snapshot_value, snapshot_is_volume_muted, snapshot_default_value = snapshot[object_id]
+            default_volume_level = cfg.get(CONF_DEFAULT_VOLUME_LEVEL)
+
+            # a changed default volume level takes precedence over the stored value
+            if snapshot_default_value == (100.*default_volume_level if default_volume_level is not None else None):
+                value = snapshot_value
+
+            is_volume_muted = snapshot_is_volume_muted
+            cast_network.restored.add(object_id)
+
+        # rate-limit the volume commands that are sent to the media player
+        if cfg[CONF_VOLUME_SET_INTERVAL]:
+            hass.data.setdefault(DATA_VOLUME_SET_QUEUES, {})['{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id)] = VolumeSetQueue(cfg[CONF_VOLUME_SET_INTERVAL], cast_network.clock)
+
         if CONF_MEMBERS not in cfg:
-            entities.append(CastVolumeTrackerEntity(hass, object_id, name, CastVolumeTrackerIndividual(CN, object_id, cast_is_on, value, is_volume_muted, cfg[CONF_PARENTS], cfg[CONF_MUTE_WHEN_OFF], cfg.get(CONF_DEFAULT_VOLUME_LEVEL)), off_script, on_script))
+            entities.append(CastVolumeTrackerEntity(hass, object_id, name, CastVolumeTrackerIndividual(cast_network, object_id, cast_is_on, value, is_volume_muted, cfg[CONF_PARENTS], cfg[CONF_MUTE_WHEN_OFF], cfg.get(CONF_DEFAULT_VOLUME_LEVEL)), off_script, on_script, coalesce_window, statistics, recorder))
         else:
-            entities.append(CastVolumeTrackerEntity(hass, object_id, name, CastVolumeTrackerGroup(CN, object_id, cast_is_on, value, is_volume_muted, cfg[CONF_MEMBERS], cfg[CONF_MEMBERS_EXCLUDED_WHEN_OFF]), off_script, on_script))
+            entities.append(CastVolumeTrackerEntity(hass, object_id, name, CastVolumeTrackerGroup(cast_network, object_id, cast_is_on, value, is_volume_muted, cfg[CONF_MEMBERS], cfg[CONF_MEMBERS_EXCLUDED_WHEN_OFF]), off_script, on_script, coalesce_window, statistics, recorder))
+
+    return entities
+
+
+def setup_networks(hass, trackers_config, snapshot=None, clock=time.monotonic):
+    """Create the cast networks, their trackers, and their entities from the (validated) configuration.
+
+    The networks are stored in ``hass.data`` and each one is reconciled (in a single pass) when Home Assistant starts.
+
+    """
+    # each network is independent of the others, so they can be updated and reconciled concurrently
+    networks = hass.data[DATA_CAST_NETWORKS] = {}
+    hass.data[DATA_VOLUME_SET_QUEUES] = {}
+    hass.data[DATA_DISPATCHER] = StateChangeDispatcher(hass)
+    states = {state.entity_id: state for state in hass.states.async_all()}
+    entities = []
+    for network, network_config in partition_trackers(trackers_config).items():
+        networks[network] = CastNetwork(clock)
+        entities.extend(create_entities(hass, networks[network], network_config, states, snapshot or {}))
+
+    @callback
+    def cast_volume_tracker_startup(event):
+        """Reconcile every tracker against a single snapshot of the media player states."""
+        for cast_network in networks.values():
+            hass.async_create_task(cast_network.async_reconcile(hass))
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_START, cast_volume_tracker_startup)
+
+    return entities
+
+
+def record_command(hass, entity_ids, service, data):
+    """Add a ``cast_volume_tracker`` service call to the traces of the trackers it targets (default: all).
+
+    Each trace gets at most one record, even if it contains several of the targeted trackers.
+
+    """
+    recorders = []
+    for cast_network in hass.data[DATA_CAST_NETWORKS].values():
+        object_ids = cast_network.casts if entity_ids is None else [cast_network.object_ids[entity_id] for entity_id in entity_ids if entity_id in cast_network.object_ids]
+        for object_id in object_ids:
+            entity = cast_network.entities.get(object_id)
+            if entity and entity.recorder and entity.recorder not in recorders:
+                recorders.append(entity.recorder)
+
+    for recorder in recorders:
+        recorder.record('command', service=service, data=data)
+
+
+def snapshot_networks(networks):
+    """Get a snapshot of all of the trackers in ``networks``."""
+    snapshot = {}
+    for cast_network in networks.values():
+        snapshot.update(cast_network.snapshot())
+
+    return snapshot
+
+
+def _entity_ids_by_network(hass, entity_ids):
+    """Group cast volume tracker entity IDs by the network to which they belong (network name -> entity IDs)."""
+    networks = hass.data[DATA_CAST_NETWORKS]
+    network_entity_ids = {}
+    for entity_id in entity_ids:
+        network = next((network for network in networks if entity_id.startswith(DOMAIN + '.') and entity_id in networks[network].object_ids), None)
+        if network is None:
+            _LOGGER.error("Unknown cast volume tracker '%s'", entity_id)
+            continue
+
+        network_entity_ids.setdefault(network, []).append(entity_id)
+
+    return network_entity_ids
+
+
+async def async_volume_set_many(hass, volume_levels):
+    """Set the volume levels of several trackers (entity ID -> volume level), with one batch per network."""
+    networks = hass.data[DATA_CAST_NETWORKS]
+    record_command(hass, list(volume_levels), SERVICE_VOLUME_SET_MANY, {ATTR_VOLUME_LEVELS: dict(volume_levels)})
+    await asyncio.gather(*[networks[network].async_volume_set_many(hass, {entity_id: volume_levels[entity_id] for entity_id in entity_ids}) for network, entity_ids in _entity_ids_by_network(hass, volume_levels).items()])
+
+
+@callback
+def async_save_volumes(hass, entity_ids=None):
+    """Save the ``value`` and ``is_volume_muted`` attributes of the trackers (default: all) in memory."""
+    networks = hass.data[DATA_CAST_NETWORKS]
+    record_command(hass, entity_ids, SERVICE_SNAPSHOT, {} if entity_ids is None else {ATTR_ENTITY_ID: list(entity_ids)})
+    if entity_ids is None:
+        for cast_network in networks.values():
+            cast_network.save_volumes()
+        return
+
+    for network, network_entity_ids in _entity_ids_by_network(hass, entity_ids).items():
+        networks[network].save_volumes([networks[network].object_ids[entity_id] for entity_id in network_entity_ids])
+
+
+async def async_restore_volumes(hass, entity_ids=None):
+    """Restore the saved attributes of the trackers (default: all), with one batch per network."""
+    networks = hass.data[DATA_CAST_NETWORKS]
+    record_command(hass, entity_ids, SERVICE_RESTORE, {} if entity_ids is None else {ATTR_ENTITY_ID: list(entity_ids)})
+    if entity_ids is None:
+        await asyncio.gather(*[cast_network.async_restore_volumes(hass) for cast_network in networks.values()])
+        return
+
+    await asyncio.gather(*[networks[network].async_restore_volumes(hass, [networks[network].object_ids[entity_id] for entity_id in network_entity_ids]) for network, network_entity_ids in _entity_ids_by_network(hass, entity_ids).items()])
+
+
+@callback
+def async_schedule_snapshot(hass):
+    """Schedule the snapshot to be written to storage in `STORAGE_SAVE_DELAY` seconds, unless a write is already scheduled.
+
+    ``Store.async_delay_save`` restarts its timer whenever it is called, so it is only called once per batch.
+
+    """
+    store = hass.data.get(DATA_STORE)
+    if store is None or hass.data.get(DATA_SNAPSHOT_SCHEDULED):
+        return
+
+    def snapshot():
+        """Get the snapshot of the trackers when it is written (so that later changes are included)."""
+        hass.data[DATA_SNAPSHOT_SCHEDULED] = False
+        return snapshot_networks(hass.data[DATA_CAST_NETWORKS])
+
+    hass.data[DATA_SNAPSHOT_SCHEDULED] = True
+    store.async_delay_save(snapshot, STORAGE_SAVE_DELAY)
+
+
+async def async_setup(hass, config):
+    """Set up a cast volume tracker."""
+    component = EntityComponent(_LOGGER, DOMAIN, hass)
+
+    # load the snapshot of the trackers in one read
+    store = hass.data[DATA_STORE] = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    snapshot = await store.async_load()
+
+    entities = setup_networks(hass, config[DOMAIN], snapshot)
 
     if not entities:
         return False
 
-    component.async_register_entity_service(
-        SERVICE_VOLUME_MUTE, SERVICE_VOLUME_MUTE_SCHEMA,
-        'async_volume_mute'
-    )
+    for service, schema, method in ENTITY_SERVICES:
+        component.async_register_entity_service(service, schema, method)
 
-    component.async_register_entity_service(
-        SERVICE_VOLUME_SET, SERVICE_VOLUME_SET_SCHEMA,
-        'async_volume_set'
-    )
+    async_register_services(hass)
 
     await component.async_add_entities(entities)
     return True
 
 
+@callback
+def async_register_services(hass):
+    """Register the services that are not entity services (see ``ENTITY_SERVICES``)."""
+    networks = hass.data[DATA_CAST_NETWORKS]
+
+    async def async_handle_reconcile(service):
+        """Reconcile the cast volume trackers in the specified networks (default: all networks)."""
+        names = service.data.get(CONF_NETWORK, list(networks))
+        for name in names:
+            if name not in networks:
+                _LOGGER.error("Unknown cast volume tracker network '%s'", name)
+
+        for name in names:
+            if name in networks:
+                record_command(hass, [ENTITY_ID_FORMAT.format(object_id) for object_id in networks[name].casts], SERVICE_RECONCILE, {CONF_NETWORK: [name]})
+
+        await asyncio.gather(*[networks[name].async_reconcile(hass) for name in names if name in networks])
+
+    hass.services.async_register(DOMAIN, SERVICE_RECONCILE, async_handle_reconcile, schema=SERVICE_RECONCILE_SCHEMA)
+
+    async def async_handle_volume_set_many(service):
+        """Set the volume levels of several cast volume trackers at once."""
+        await async_volume_set_many(hass, service.data[ATTR_VOLUME_LEVELS])
+
+    hass.services.async_register(DOMAIN, SERVICE_VOLUME_SET_MANY, async_handle_volume_set_many, schema=SERVICE_VOLUME_SET_MANY_SCHEMA)
+
+    async def async_handle_snapshot(service):
+        """Save the volume levels of the cast volume trackers."""
+        async_save_volumes(hass, service.data.get(ATTR_ENTITY_ID))
+
+    async def async_handle_restore(service):
+        """Restore the saved volume levels of the cast volume trackers."""
+        await async_restore_volumes(hass, service.data.get(ATTR_ENTITY_ID))
+
+    hass.services.async_register(DOMAIN, SERVICE_SNAPSHOT, async_handle_snapshot, schema=SERVICE_DEFAULT_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_RESTORE, async_handle_restore, schema=SERVICE_DEFAULT_SCHEMA)
+
+
 class CastVolumeTrackerEntity(RestoreEntity):
     """Representation of a Cast volume tracker."""
 
-    def __init__(self, hass, object_id, name, cast_volume_tracker, off_script, on_script):
+    def __init__(self, hass, object_id, name, cast_volume_tracker, off_script, on_script, coalesce_window=0., statistics=False, recorder=None):
         """Initialize a Cast Volume Tracker."""
         self.hass = hass
         self.entity_id = ENTITY_ID_FORMAT.format(object_id)
@@ -446,6 +1671,25 @@ class CastVolumeTrackerEntity(RestoreEntity):
         self._name = name
         self._cast_volume_tracker = cast_volume_tracker
 
+        # media player state changes that arrive within this many seconds of each other are handled together
+        self._coalesce_window = coalesce_window
+        self._unsub_coalesce = None
+
+        # the number of media player state changes that were merged into an already-pending re-evaluation
+        self.coalesced_events = 0
+
+        # include the tracker's statistics in the state attributes
+        self._statistics = statistics
+
+        # the `(state, state attributes)` that were last written to the state machine
+        self._written_state = None
+
+        # the `value` and `is_volume_muted` attributes when the snapshot was last scheduled to be written
+        self._snapshot_state = None
+
+        # the `CastVolumeTrackerTraceRecorder` for the trace file to which this tracker is recorded
+        self.recorder = recorder
+
         if off_script:
             self._off_script = Script(hass, off_script)
         else:
@@ -474,34 +1718,102 @@ class CastVolumeTrackerEntity(RestoreEntity):
     @property
     def state_attributes(self):
         """Return the state attributes."""
+        if self._statistics:
+            return dict(self._cast_volume_tracker.state_attributes, statistics=self.statistics)
+
         return self._cast_volume_tracker.state_attributes
 
+    @property
+    def statistics(self):
+        """Return the tracker's performance statistics."""
+        return dict(self._cast_volume_tracker.statistics.as_dict(), coalesced_events=self.coalesced_events)
+
+    async def async_write_state_if_changed(self):
+        """Write the state to the state machine, unless it is unchanged since the last write.
+
+        The ``statistics`` attribute is not compared; it is refreshed whenever the state is written.
+
+        """
+        written_state = (self.state, self._cast_volume_tracker.state_attributes)
+        if written_state == self._written_state:
+            return
+
+        self._written_state = written_state
+        await self.async_update_ha_state()
+
+        snapshot_state = (self._cast_volume_tracker.value, self._cast_volume_tracker.is_volume_muted)
+        if snapshot_state != self._snapshot_state:
+            self._snapshot_state = snapshot_state
+            async_schedule_snapshot(self.hass)
+
+    def record_decision(self, cast_is_on):
+        """Record the tracker's attributes after it was re-evaluated (``cast_is_on`` is its prior ``cast_is_on`` attribute)."""
+        if self.recorder:
+            cast = self._cast_volume_tracker
+            self.recorder.record('decision', object_id=cast.object_id, was_on=cast_is_on, cast_is_on=cast.cast_is_on, cast_volume_level=cast.cast_volume_level, value=cast.value, is_volume_muted=cast.is_volume_muted)
+
+    def record_service_calls(self, service_args):
+        """Record the service calls that were emitted by the tracker."""
+        if self.recorder:
+            for args in service_args:
+                self.recorder.record('call', object_id=self._cast_volume_tracker.object_id, domain=args.domain, service=args.service, entity_ids=list(args.entity_ids), data=dict(args.data))
+
+    async def async_diagnostics(self):
+        """Log the tracker's performance statistics."""
+        _LOGGER.info("%s: %s", self.entity_id, self.statistics)
+
     async def async_added_to_hass(self):
         """Run when entity about to be added to hass and register callbacks."""
+        cast_network = self._cast_volume_tracker.cast_network
+        cast_network.entities[self._cast_volume_tracker.object_id] = self
+
+        @callback
+        def cast_volume_tracker_coalesce_window_elapsed(now):
+            """Re-evaluate the tracker against the latest state of the media player."""
+            self._unsub_coalesce = None
+            cast_network.mark_dirty(self.entity_id)
+            cast_network.async_schedule_update(self.hass)
+
         @callback
         def cast_volume_tracker_state_listener(entity, old_state, new_state):
             """Handle target device state changes."""
-            self.async_schedule_update_ha_state(True)
+            if self.recorder:
+                self.recorder.record('state', entity_id=entity, state=new_state and new_state.state, volume_level=new_state and new_state.attributes.get(ATTR_MEDIA_VOLUME_LEVEL))
+
+            if self._unsub_coalesce is not None or self._cast_volume_tracker.object_id in cast_network.dirty:
+                self.coalesced_events += 1
+                _LOGGER.debug("%s: coalesced %d media player event(s)", self.entity_id, self.coalesced_events)
+                return
+
+            if self._coalesce_window:
+                self._unsub_coalesce = async_call_later(self.hass, self._coalesce_window, cast_volume_tracker_coalesce_window_elapsed)
+                return
+
+            cast_network.mark_dirty(entity)
+            cast_network.async_schedule_update(self.hass)
 
         @callback
         def cast_volume_tracker_startup(event):
-            """Listen for state changes."""
-            if self._entities:
-                async_track_state_change(self.hass, self._entities, cast_volume_tracker_state_listener)
+            """Listen for state changes (the network reconciles every tracker at startup)."""
+            if self.recorder:
+                cast = self._cast_volume_tracker
+                cast_state_obj = self.hass.states.get(cast.media_player)
+                self.recorder.record('start', object_id=cast.object_id, time=time.time(), state=cast_state_obj and cast_state_obj.state, volume_level=cast_state_obj and cast_state_obj.attributes.get(ATTR_MEDIA_VOLUME_LEVEL), cast_is_on=cast.cast_is_on, value=cast.value, is_volume_muted=cast.is_volume_muted)
 
-            self.async_schedule_update_ha_state(True)
+            if self._entities:
+                self.hass.data[DATA_DISPATCHER].async_subscribe(self._entities, cast_volume_tracker_state_listener)
 
         self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_START, cast_volume_tracker_startup)
 
         await super().async_added_to_hass()
 
-        # If the cast is off, restore the last `value` and `is_volume_muted` attributes
-        if self._cast_volume_tracker.cast_is_on:
+        # If the cast is off and it wasn't restored from the snapshot, restore the last `value` and `is_volume_muted` attributes
+        if self._cast_volume_tracker.cast_is_on or self._cast_volume_tracker.object_id in cast_network.restored:
             return
 
         state = await self.async_get_last_state()
         value = state and float(state.state)
-        is_volume_muted = state.attributes.get(ATTR_MEDIA_VOLUME_MUTED)
+        is_volume_muted = state and state.attributes.get(ATTR_MEDIA_VOLUME_MUTED)
 
         # Check against None because value can be 0
         if value is not None:
@@ -512,33 +1824,45 @@ class CastVolumeTrackerEntity(RestoreEntity):
 
     async def async_volume_set(self, volume_level):
         """Set new volume level."""
+        if self.recorder:
+            self.recorder.record('command', service=SERVICE_VOLUME_SET, data={ATTR_ENTITY_ID: [self.entity_id], ATTR_MEDIA_VOLUME_LEVEL: volume_level})
+
         service_args = self._cast_volume_tracker.volume_set(volume_level)
+        self.record_service_calls(service_args)
 
-        for args in service_args:
-            await self.hass.services.async_call(*args)
+        start = time.perf_counter()
+        await async_perform_service_calls(self.hass, service_args)
+        self._cast_volume_tracker.statistics.record_dispatch(time.perf_counter() - start, service_args)
 
-        await self.async_update_ha_state()
+        await self._cast_volume_tracker.cast_network.async_write_changed()
 
     async def async_volume_mute(self, is_volume_muted):
         """Mute the volume."""
+        if self.recorder:
+            self.recorder.record('command', service=SERVICE_VOLUME_MUTE, data={ATTR_ENTITY_ID: [self.entity_id], ATTR_MEDIA_VOLUME_MUTED: is_volume_muted})
+
         service_args = self._cast_volume_tracker.volume_mute(is_volume_muted)
+        self.record_service_calls(service_args)
 
-        for args in service_args:
-            await self.hass.services.async_call(*args)
+        start = time.perf_counter()
+        await async_perform_service_calls(self.hass, service_args)
+        self._cast_volume_tracker.statistics.record_dispatch(time.perf_counter() - start, service_args)
 
-        await self.async_update_ha_state()
+        await self._cast_volume_tracker.cast_network.async_write_changed()
 
     async def async_update(self):
         """Update the state and perform any necessary service calls."""
-        cast_is_on = self._cast_volume_tracker.cast_is_on
-        service_args = self._cast_volume_tracker.update(self.hass)
-
-        for args in service_args:
-            await self.hass.services.async_call(*args)
+        cast_network = self._cast_volume_tracker.cast_network
+        cast_network.mark_dirty(self.entity_id)
+        await cast_network.async_update(self.hass)
 
+    async def async_cast_updated(self, cast_is_on):
+        """Run the on/off scripts and update the state after the cast volume tracker has been re-evaluated."""
         if cast_is_on and not self._cast_volume_tracker.cast_is_on:
             if self._off_script:
                 await self._off_script.async_run(context=self._context)
         elif not cast_is_on and self._cast_volume_tracker.cast_is_on:
             if self._on_script:
                 await self._on_script.async_run(context=self._context)
+
+        await self.async_write_state_if_changed()
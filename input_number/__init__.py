@@ -1,5 +1,7 @@
 """Support to set a numeric value from a slider or text box."""
+import asyncio
 import logging
+import math
 
 import voluptuous as vol
 
@@ -64,17 +66,30 @@ def _cv_input_number(cfg):
 # =========================================================================== #
 from homeassistant.core import callback
 from homeassistant.const import (
-    CONF_ENTITY_ID, CONF_ICON_TEMPLATE, CONF_VALUE_TEMPLATE, EVENT_HOMEASSISTANT_START, MATCH_ALL)
+    CONF_ENTITY_ID, CONF_ICON_TEMPLATE, CONF_VALUE_TEMPLATE, EVENT_HOMEASSISTANT_START, EVENT_STATE_CHANGED, MATCH_ALL)
 from homeassistant.exceptions import TemplateError
-from homeassistant.helpers.event import async_track_state_change
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.script import Script
 
 
 CONF_SET_VALUE_SCRIPT = 'set_value_script'
 CONF_VALUE_CHANGED_SCRIPT = 'value_changed_script'
+CONF_SCRIPT_MODE = 'script_mode'
+CONF_SCRIPT_MAX_RUNS = 'script_max_runs'
+CONF_MIN_RENDER_INTERVAL = 'min_render_interval'
+
+SCRIPT_MODE_QUEUED = 'queued'
+SCRIPT_MODE_RESTART = 'restart'
+SCRIPT_MODE_QUEUE_LATEST = 'queue_latest'
+SCRIPT_MODE_PARALLEL = 'parallel'
+SCRIPT_MODES = [SCRIPT_MODE_QUEUED, SCRIPT_MODE_RESTART,
+                SCRIPT_MODE_QUEUE_LATEST, SCRIPT_MODE_PARALLEL]
 
 SERVICE_SET_VALUE_NO_SCRIPT = 'set_value_no_script'
 
+# `hass.data` key for the `StateChangeDispatcher`
+DATA_DISPATCHER = DOMAIN + '_dispatcher'
+
 
 def _cv_template_number(cfg):
     """Configure validation helper for template number (voluptuous)."""
@@ -104,15 +119,36 @@ CONFIG_SCHEMA = vol.Schema({
             vol.Optional(CONF_SET_VALUE_SCRIPT): cv.SCRIPT_SCHEMA,
             vol.Optional(CONF_ENTITY_ID): cv.entity_ids,
             vol.Optional(CONF_ICON_TEMPLATE): cv.template,
-            vol.Optional(CONF_VALUE_CHANGED_SCRIPT): cv.SCRIPT_SCHEMA
+            vol.Optional(CONF_VALUE_CHANGED_SCRIPT): cv.SCRIPT_SCHEMA,
+            vol.Optional(CONF_SCRIPT_MODE, default=SCRIPT_MODE_QUEUED):
+                vol.In(SCRIPT_MODES),
+            vol.Optional(CONF_SCRIPT_MAX_RUNS, default=10):
+                vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(CONF_MIN_RENDER_INTERVAL, default=1.):
+                vol.All(vol.Coerce(float), vol.Range(min=0.))
         }, _cv_template_number)
     )
 }, required=True, extra=vol.ALLOW_EXTRA)
 
 
+def _template_entity_ids(template):
+    """Get the set of entity ID's used by a template.
+
+    Returns ``None`` if they can't be extracted, in which case they will be
+    discovered when the template is rendered.
+
+    """
+    entity_ids = template.extract_entities()
+    if str(entity_ids) == MATCH_ALL:
+        return None
+
+    return set(entity_ids)
+
+
 async def async_setup(hass, config):
     """Set up an input slider."""
     component = EntityComponent(_LOGGER, DOMAIN, hass)
+    hass.data[DATA_DISPATCHER] = StateChangeDispatcher(hass)
 
     entities = []
 
@@ -132,26 +168,43 @@ async def async_setup(hass, config):
             set_value_script = cfg.get(CONF_SET_VALUE_SCRIPT)
             value_template = cfg.get(CONF_VALUE_TEMPLATE)
             value_changed_script = cfg.get(CONF_VALUE_CHANGED_SCRIPT)
+            script_mode = cfg.get(CONF_SCRIPT_MODE)
+            script_max_runs = cfg.get(CONF_SCRIPT_MAX_RUNS)
+            min_render_interval = cfg.get(CONF_MIN_RENDER_INTERVAL)
 
-            # setup the entity ID's for the template
+            # setup the entity ID's for each template
             template_entity_ids = set()
+            value_entity_ids = icon_entity_ids = None
             if value_template is not None:
-                temp_ids = value_template.extract_entities()
-                if str(temp_ids) != MATCH_ALL:
-                    template_entity_ids |= set(temp_ids)
+                value_entity_ids = _template_entity_ids(value_template)
+                if value_entity_ids is not None:
+                    template_entity_ids |= value_entity_ids
 
             if icon_template is not None:
-                icon_ids = icon_template.extract_entities()
-                if str(icon_ids) != MATCH_ALL:
-                    template_entity_ids |= set(icon_ids)
+                icon_entity_ids = _template_entity_ids(icon_template)
+                if icon_entity_ids is not None:
+                    template_entity_ids |= icon_entity_ids
 
+            # if the entity ID's are provided, the ones that weren't extracted
+            # from either template may be used by both of them, and a
+            # template whose entities can't be extracted is always rendered
             entity_ids = cfg.get(CONF_ENTITY_ID, template_entity_ids)
+            if CONF_ENTITY_ID in cfg:
+                other_entity_ids = set(entity_ids) - template_entity_ids
+                if value_template is not None:
+                    value_entity_ids = MATCH_ALL if value_entity_ids is None \
+                        else value_entity_ids | other_entity_ids
+                if icon_template is not None:
+                    icon_entity_ids = MATCH_ALL if icon_entity_ids is None \
+                        else icon_entity_ids | other_entity_ids
 
             # Template Number
             entities.append(TemplateNumber(
                 object_id, name, initial, minimum, maximum, step, icon,
                 icon_template, unit, mode, hass, value_template,
-                set_value_script, entity_ids, value_changed_script))
+                set_value_script, entity_ids, value_changed_script,
+                script_mode, script_max_runs, value_entity_ids,
+                icon_entity_ids, min_render_interval))
 
             continue
 
@@ -295,54 +348,427 @@ class InputNumber(RestoreEntity):
         await self.async_update_ha_state()
 
 
+class ScriptRunner:
+    """Run a script according to an execution mode.
+
+    * ``queued``: each run waits for the previous one to finish
+    * ``restart``: a new run stops the current one
+    * ``queue_latest``: while a run is in progress, only the latest request
+      is kept, and it is run once the current run finishes
+    * ``parallel``: up to ``max_runs`` runs at the same time; further
+      requests are dropped
+
+    """
+
+    def __init__(self, hass, sequence, mode=SCRIPT_MODE_QUEUED, max_runs=10):
+        """Initialize the script runner."""
+        self.hass = hass
+        self._mode = mode
+        self._max_runs = max_runs
+
+        # a script can't run concurrently with itself, so parallel runs each
+        # need their own copy
+        num_scripts = max_runs if mode == SCRIPT_MODE_PARALLEL else 1
+        self._idle_scripts = [self._create_script(sequence)
+                              for _ in range(num_scripts)]
+
+        # events that are set when a suspended script finishes
+        self._finished = {}
+
+        self._lock = asyncio.Lock()
+        self._pending = None
+        self._task = None
+
+    async def async_run(self, variables, context=None):
+        """Run the script (or not) according to the execution mode."""
+        if self._mode == SCRIPT_MODE_RESTART:
+            await self._async_restart(variables, context)
+
+        elif self._mode == SCRIPT_MODE_QUEUE_LATEST:
+            # replace the request that is waiting for the current run
+            if self._lock.locked():
+                self._pending = (variables, context)
+                return
+
+            async with self._lock:
+                await self._async_run_script(variables, context)
+                while self._pending is not None:
+                    variables, context = self._pending
+                    self._pending = None
+                    await self._async_run_script(variables, context)
+
+        elif self._mode == SCRIPT_MODE_PARALLEL:
+            if not self._idle_scripts:
+                _LOGGER.warning("Maximum number of runs (%s) exceeded",
+                                self._max_runs)
+                return
+
+            await self._async_run_script(variables, context)
+
+        else:
+            # like `Script.async_run`, return once the run has finished or
+            # reached a `delay` or `wait_template` step; the next run still
+            # waits for this one to finish
+            await self._lock.acquire()
+            script = self._idle_scripts[0]
+            try:
+                await script.async_run(variables, context=context)
+            finally:
+                if script.is_running:
+                    self.hass.async_create_task(
+                        self._async_release_when_finished(script))
+                else:
+                    self._lock.release()
+
+    def _create_script(self, sequence):
+        """Create a copy of the script that reports when it finishes."""
+        script = None
+
+        @callback
+        def script_changed():
+            """Wake up the run that is waiting for the script to finish."""
+            if not script.is_running and script in self._finished:
+                self._finished.pop(script).set()
+
+        script = Script(self.hass, sequence, change_listener=script_changed)
+        return script
+
+    async def _async_run_to_completion(self, script, variables, context):
+        """Run the script and wait for it to finish.
+
+        ``Script.async_run`` returns when the script reaches a ``delay`` or
+        ``wait_template`` step, while the script is still running.
+
+        """
+        await script.async_run(variables, context=context)
+        await self._async_wait_until_finished(script)
+
+    async def _async_wait_until_finished(self, script):
+        """Wait until the script is no longer running."""
+        while script.is_running:
+            finished = self._finished[script] = asyncio.Event()
+            await finished.wait()
+
+    async def _async_release_when_finished(self, script):
+        """Release the lock once the (suspended) script has finished."""
+        try:
+            await self._async_wait_until_finished(script)
+        finally:
+            self._lock.release()
+
+    async def _async_run_script(self, variables, context):
+        """Run an idle copy of the script."""
+        script = self._idle_scripts.pop()
+        try:
+            await self._async_run_to_completion(script, variables, context)
+        finally:
+            self._idle_scripts.append(script)
+
+    async def _async_restart(self, variables, context):
+        """Stop the current run (if any) and run the script."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+        script = self._idle_scripts[0]
+        if script.is_running:
+            script.async_stop()
+
+        self._task = task = self.hass.async_create_task(
+            self._async_run_to_completion(script, variables, context))
+
+        try:
+            await task
+        except asyncio.CancelledError:
+            # only swallow the cancellation if this run was superseded by a
+            # newer one, not if the caller itself was cancelled
+            if task is self._task:
+                raise
+
+
+class StateChangeDispatcher:
+    """A single ``state_changed`` listener for all of the template numbers.
+
+    Events are routed to the entities that subscribed to them via an
+    entity ID -> subscribers index (the same as the ``cast_volume_tracker``
+    component's dispatcher, plus wildcard subscriptions).
+
+    """
+
+    def __init__(self, hass):
+        """Initialize the dispatcher."""
+        self.hass = hass
+        self.subscribers = {}
+        self.wildcard_subscribers = []
+        self._unsub = None
+
+    @callback
+    def async_subscribe(self, entity_ids, action):
+        """Call ``action(entity_id, old_state, new_state)`` on state changes.
+
+        ``entity_ids`` may be ``MATCH_ALL``.  Returns a callback that
+        unsubscribes.
+
+        """
+        if entity_ids == MATCH_ALL:
+            self.wildcard_subscribers.append(action)
+        else:
+            entity_ids = [entity_id.lower() for entity_id in entity_ids]
+            for entity_id in entity_ids:
+                self.subscribers.setdefault(entity_id, []).append(action)
+
+        if self._unsub is None:
+            self._unsub = self.hass.bus.async_listen(
+                EVENT_STATE_CHANGED, self._async_state_changed)
+
+        @callback
+        def async_unsubscribe():
+            """Remove the subscriptions (and any entries left empty)."""
+            if entity_ids == MATCH_ALL:
+                self.wildcard_subscribers.remove(action)
+                return
+
+            for entity_id in entity_ids:
+                self.subscribers[entity_id].remove(action)
+                if not self.subscribers[entity_id]:
+                    del self.subscribers[entity_id]
+
+        return async_unsubscribe
+
+    @callback
+    def _async_state_changed(self, event):
+        """Pass a state change to its subscribers."""
+        entity_id = event.data.get(ATTR_ENTITY_ID)
+        subscribers = self.subscribers.get(entity_id)
+        if not subscribers and not self.wildcard_subscribers:
+            return
+
+        for action in tuple(subscribers or ()) + tuple(
+                self.wildcard_subscribers):
+            self.hass.async_run_job(
+                action, entity_id, event.data.get('old_state'),
+                event.data.get('new_state'))
+
+
+class _RecordingStateMachine:
+    """A wrapper around the state machine that records the states read."""
+
+    def __init__(self, states):
+        """Initialize the wrapper."""
+        self._states = states
+        self._read = None
+        self._read_all = False
+
+    def __getattr__(self, name):
+        """Pass through anything that doesn't read states."""
+        return getattr(self._states, name)
+
+    def start(self):
+        """Start recording."""
+        self._read = set()
+        self._read_all = False
+
+    def stop(self):
+        """Stop recording and return the entity ID's read (or ``MATCH_ALL``)."""
+        read, self._read = self._read, None
+        return MATCH_ALL if self._read_all else read
+
+    def get(self, entity_id):
+        """Retrieve the state of an entity."""
+        if self._read is not None:
+            self._read.add(entity_id.lower())
+        return self._states.get(entity_id)
+
+    def is_state(self, entity_id, state):
+        """Test if an entity is in a specific state."""
+        state_obj = self.get(entity_id)
+        return state_obj is not None and state_obj.state == state
+
+    def _all(self, method, *args):
+        """Call a method that reads every state (i.e., a wildcard)."""
+        self._read_all = True
+        return getattr(self._states, method)(*args)
+
+    def all(self, *args):
+        """Return all states."""
+        return self._all('all', *args)
+
+    def async_all(self, *args):
+        """Return all states."""
+        return self._all('async_all', *args)
+
+    def entity_ids(self, *args):
+        """Return all entity ID's."""
+        return self._all('entity_ids', *args)
+
+    def async_entity_ids(self, *args):
+        """Return all entity ID's."""
+        return self._all('async_entity_ids', *args)
+
+
+class _TemplateRecorder:
+    """Discover the entities that a template reads when it is rendered.
+
+    The template environment (and its ``states``, ``is_state``, etc.
+    globals) is shared by every template and bound to the real ``hass``, so
+    the reads are captured by replacing ``hass.states`` for the duration of
+    the render.
+
+    """
+
+    def __init__(self, hass):
+        """Initialize the recorder."""
+        self.hass = hass
+
+        # the entity ID's read during the last render (or `MATCH_ALL`)
+        self.entity_ids = None
+
+    def async_render(self, template):
+        """Render the template and record the entities that it reads."""
+        states = self.hass.states
+        recording_states = _RecordingStateMachine(states)
+        recording_states.start()
+        self.hass.states = recording_states
+        try:
+            return template.async_render()
+        finally:
+            self.hass.states = states
+            self.entity_ids = recording_states.stop()
+
+
 class TemplateNumber(InputNumber):
     """Representation of a slider with template functionality."""
 
     def __init__(self, object_id, name, initial, minimum, maximum, step, icon,
                  icon_template, unit, mode, hass, value_template,
-                 set_value_script, entity_ids, value_changed_script):
+                 set_value_script, entity_ids, value_changed_script,
+                 script_mode=SCRIPT_MODE_QUEUED, script_max_runs=10,
+                 value_entity_ids=MATCH_ALL, icon_entity_ids=MATCH_ALL,
+                 min_render_interval=1.):
         """Initialize a template number."""
         super().__init__(object_id, name, initial, minimum, maximum, step,
                          icon, unit, mode)
         self.hass = hass
         self._entities = entity_ids
 
+        # templates whose entity ID's (`None`) are discovered when they are
+        # rendered get a recorder that captures the states read
+        self._value_recorder = None
+        self._icon_recorder = None
+
         # template
         self._value_template = value_template
         if self._value_template is not None:
             self._value_template.hass = self.hass
+            if value_entity_ids is None:
+                self._value_recorder = _TemplateRecorder(hass)
 
         # icon template
         self._icon_template = icon_template
         if self._icon_template is not None:
             self._icon_template.hass = self.hass
+            if icon_entity_ids is None:
+                self._icon_recorder = _TemplateRecorder(hass)
+
+        # the entity ID's used by each template (or `MATCH_ALL`) and the
+        # states of those entities the last time that it was rendered
+        self._value_entity_ids = value_entity_ids or MATCH_ALL
+        self._icon_entity_ids = icon_entity_ids or MATCH_ALL
+        self._value_inputs = None
+        self._icon_inputs = None
+
+        # the entities whose state changes are being tracked (or
+        # `MATCH_ALL`), and the ones among them that aren't throttled
+        self._tracked_entities = None
+        self._direct_entities = set()
+        self._unsub_track = None
+
+        # changes that only a wildcard template may depend on trigger at most
+        # one render every `min_render_interval` seconds
+        self._min_render_interval = min_render_interval
+        self._last_render = -math.inf
+        self._unsub_render_later = None
+
+        # entities that have changed since the last update (`None` = all)
+        self._changed_entities = None
 
         # set_value_script
         if set_value_script:
-            self._set_value_script = Script(hass, set_value_script)
+            self._set_value_script = ScriptRunner(
+                hass, set_value_script, script_mode, script_max_runs)
         else:
             self._set_value_script = None
 
         # value_changed_script
         if value_changed_script:
-            self._value_changed_script = Script(hass, value_changed_script)
+            self._value_changed_script = ScriptRunner(
+                hass, value_changed_script, script_mode, script_max_runs)
         else:
             self._value_changed_script = None
 
-    async def async_added_to_hass(self):
-        """Run when entity about to be added to hass and register callbacks."""
-        @callback
-        def template_number_state_listener(entity, old_state, new_state):
-            """Handle target device state changes."""
+    @callback
+    def _async_track_entities(self):
+        """Track the configured entities and the discovered entities."""
+        direct_entities = set(self._entities or [])
+        wildcard = False
+        for recorder in (self._value_recorder, self._icon_recorder):
+            if recorder is None or recorder.entity_ids is None:
+                continue
+
+            if recorder.entity_ids == MATCH_ALL:
+                wildcard = True
+            else:
+                direct_entities |= recorder.entity_ids
+
+        self._direct_entities = direct_entities
+        tracked_entities = MATCH_ALL if wildcard else direct_entities
+        if tracked_entities == self._tracked_entities:
+            return
+
+        if self._unsub_track is not None:
+            self._unsub_track()
+            self._unsub_track = None
+
+        self._tracked_entities = tracked_entities
+        if tracked_entities:
+            self._unsub_track = self.hass.data[
+                DATA_DISPATCHER].async_subscribe(
+                    tracked_entities, self._async_state_listener)
+
+    @callback
+    def _async_state_listener(self, entity, old_state, new_state):
+        """Handle target device state changes."""
+        if self._changed_entities is not None:
+            self._changed_entities.add(entity)
+
+        if entity in self._direct_entities:
+            self.async_schedule_update_ha_state(True)
+            return
+
+        # only a wildcard template may depend on this entity --> throttle
+        if self._unsub_render_later is not None:
+            return
+
+        delay = self._last_render + self._min_render_interval - \
+            self.hass.loop.time()
+        if delay <= 0:
             self.async_schedule_update_ha_state(True)
+            return
+
+        self._unsub_render_later = async_call_later(
+            self.hass, delay, self._async_render_later)
 
+    @callback
+    def _async_render_later(self, now):
+        """Render the templates once the throttle interval has elapsed."""
+        self._unsub_render_later = None
+        self.async_schedule_update_ha_state(True)
+
+    async def async_added_to_hass(self):
+        """Run when entity about to be added to hass and register callbacks."""
         @callback
         def template_number_startup(event):
             """Listen for state changes."""
-            if self._entities:
-                async_track_state_change(
-                    self.hass, self._entities, template_number_state_listener)
-
+            self._async_track_entities()
             self.async_schedule_update_ha_state(True)
 
         self.hass.bus.async_listen_once(
@@ -405,11 +831,67 @@ class TemplateNumber(InputNumber):
 
         await self.async_update_ha_state()
 
+    def _check_template(self, entity_ids, inputs):
+        """Check whether a template needs to be rendered.
+
+        A template needs to be rendered if the states of the entities that it
+        uses have changed since it was last rendered; otherwise, the last
+        result is reused.
+
+        Returns
+        -------
+        render : bool
+            Whether or not the template needs to be rendered
+        inputs : tuple, None
+            The states of the entities that the template uses
+
+        """
+        if entity_ids == MATCH_ALL:
+            return True, None
+
+        if self._changed_entities is not None and \
+                not entity_ids & self._changed_entities:
+            return False, inputs
+
+        new_inputs = tuple(
+            (state.state, state.attributes) if state else None
+            for state in (self.hass.states.get(entity_id)
+                          for entity_id in sorted(entity_ids)))
+
+        return self._changed_entities is None or new_inputs != inputs, \
+            new_inputs
+
+    def _render(self, template, recorder):
+        """Render a template, discovering its entities if necessary."""
+        if recorder is None:
+            return template.async_render()
+
+        try:
+            return recorder.async_render(template)
+        finally:
+            if template is self._value_template:
+                self._value_entity_ids = recorder.entity_ids
+            else:
+                self._icon_entity_ids = recorder.entity_ids
+
     async def async_update(self):
-        """Update the state from the template."""
+        """Update the state from the templates whose entities changed."""
+        render_value = render_icon = False
         if self._value_template:
+            render_value, self._value_inputs = self._check_template(
+                self._value_entity_ids, self._value_inputs)
+
+        if self._icon_template:
+            render_icon, self._icon_inputs = self._check_template(
+                self._icon_entity_ids, self._icon_inputs)
+
+        self._changed_entities = set()
+        self._last_render = self.hass.loop.time()
+
+        if render_value:
             try:
-                value = self._value_template.async_render()
+                value = self._render(
+                    self._value_template, self._value_recorder)
                 if value not in ['None', 'unknown'] and self._current_value != float(value):
                     self._current_value = float(value)
 
@@ -420,11 +902,17 @@ class TemplateNumber(InputNumber):
             except TemplateError as ex:
                 _LOGGER.error(ex)
 
-        if self._icon_template:
+        if render_icon:
             try:
-                setattr(self, '_icon', self._icon_template.async_render())
+                setattr(self, '_icon', self._render(
+                    self._icon_template, self._icon_recorder))
             except TemplateError as ex:
                 if ex.args and ex.args[0].startswith(
                         "UndefinedError: 'None' has no attribute"):
                     # Common during HA startup - so just a warning
                     _LOGGER.warning('Could not render icon template for %s, the state is unknown.', self._name)
+
+        # track the entities that were discovered while rendering
+        if self._tracked_entities is not None and (
+                self._value_recorder or self._icon_recorder):
+            self._async_track_entities()
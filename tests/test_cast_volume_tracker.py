@@ -0,0 +1,219 @@
+"""Tests for the ``cast_volume_tracker`` component, run against the fake Home Assistant in ``tools``."""
+import asyncio
+import glob
+import os
+import sys
+
+import pytest
+
+from homeassistant.const import ATTR_ENTITY_ID, SERVICE_TURN_ON, SERVICE_VOLUME_MUTE, SERVICE_VOLUME_SET
+from homeassistant.components.media_player.const import ATTR_MEDIA_VOLUME_LEVEL, ATTR_MEDIA_VOLUME_MUTED
+from homeassistant.components.media_player.const import DOMAIN as MEDIA_PLAYER_DOMAIN
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+
+from fake_hass import FakeHass, cast_volume_tracker  # noqa: E402  pylint: disable=wrong-import-position
+import run_scenarios  # noqa: E402  pylint: disable=wrong-import-position
+
+# a cast group with two speakers
+KITCHEN_CONFIG = {'kitchen_speakers': {'name': 'Kitchen speakers', 'members': ['kitchen_home', 'computer_speakers']},
+                  'kitchen_home': {'name': 'Kitchen Home', 'parents': ['kitchen_speakers']},
+                  'computer_speakers': {'name': 'Computer speakers', 'parents': ['kitchen_speakers']}}
+
+
+@pytest.fixture
+def hass():
+    """Get a fake Home Assistant instance with its own event loop."""
+    loop = asyncio.new_event_loop()
+    with FakeHass(loop) as fake_hass:
+        yield fake_hass
+
+    loop.close()
+
+
+def entity_id(object_id):
+    """Get the entity ID of a cast volume tracker."""
+    return cast_volume_tracker.ENTITY_ID_FORMAT.format(object_id)
+
+
+def attribute(hass, object_id, name):
+    """Get an attribute of a cast volume tracker's state."""
+    return hass.states.get(entity_id(object_id)).attributes[name]
+
+
+def media_player_calls(hass):
+    """Get the ``(entity IDs, volume level)`` of the ``media_player.volume_set`` calls that have been made."""
+    return [(sorted(data[ATTR_ENTITY_ID]), data[ATTR_MEDIA_VOLUME_LEVEL]) for domain, service, data in hass.services.calls if domain == MEDIA_PLAYER_DOMAIN and service == SERVICE_VOLUME_SET]
+
+
+async def async_set_media_player(hass, volume_level, object_id='speaker'):
+    """Report a new volume level for a media player that is playing."""
+    hass.states.async_set('{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id), 'playing', {ATTR_MEDIA_VOLUME_LEVEL: volume_level})
+    await hass.async_block_till_done()
+
+
+async def async_setup_speaker(hass, volume_level, **config):
+    """Set up an un-muted tracker for a speaker that is playing and isn't simulated, so its states are set directly."""
+    hass.states.async_set('media_player.speaker', 'playing', {ATTR_MEDIA_VOLUME_LEVEL: volume_level})
+    entities = await hass.async_setup_cast_volume_trackers({'speaker': dict(config, name='Speaker')}, simulate_media_players=False)
+    await hass.services.async_call(cast_volume_tracker.DOMAIN, SERVICE_VOLUME_MUTE, {ATTR_ENTITY_ID: entity_id('speaker'), ATTR_MEDIA_VOLUME_MUTED: False}, blocking=True)
+    await async_set_media_player(hass, volume_level)
+    del hass.services.calls[:]
+    return entities[entity_id('speaker')]
+
+
+async def async_volume_set(hass, object_id, volume_level):
+    """Set the volume level of a cast volume tracker."""
+    await hass.services.async_call(cast_volume_tracker.DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: entity_id(object_id), ATTR_MEDIA_VOLUME_LEVEL: volume_level}, blocking=True)
+    await hass.async_block_till_done()
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(run_scenarios.EXAMPLE_CONFIG, 'scripts', 'cca_test_*.yaml'))), ids=os.path.basename)
+def test_scenarios(path):
+    """The ``cca_test_*`` scripts from the example configuration pass."""
+    trackers_config = run_scenarios.load_yaml(os.path.join(run_scenarios.EXAMPLE_CONFIG, 'cast_volume_trackers.yaml'))
+    input_numbers_config = run_scenarios.load_yaml(os.path.join(run_scenarios.EXAMPLE_CONFIG, 'input_numbers.yaml'))
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(run_scenarios.async_run_script(path, trackers_config, input_numbers_config))
+    finally:
+        loop.close()
+
+    assert results
+    assert [message for passed, message in results if not passed] == []
+
+
+def test_coalesce_service_calls():
+    """Calls with the same payload are merged and duplicates are dropped, without reordering the calls for a device."""
+    def volume_set(object_id, volume_level):
+        """Get a ``media_player.volume_set`` call."""
+        return cast_volume_tracker.CastServiceCall.create(MEDIA_PLAYER_DOMAIN, SERVICE_VOLUME_SET, '{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id), **{ATTR_MEDIA_VOLUME_LEVEL: volume_level})
+
+    coalesced, saved = cast_volume_tracker.coalesce_service_calls([volume_set('a', 0.2), volume_set('b', 0.2), volume_set('a', 0.2)])
+    assert coalesced == [volume_set('a', 0.2)._replace(entity_ids=('media_player.a', 'media_player.b'))]
+    assert saved == 2
+
+    # `b` can't be merged into the first call, because that would send it 0.2 before 0.1
+    coalesced, saved = cast_volume_tracker.coalesce_service_calls([volume_set('a', 0.2), volume_set('b', 0.1), volume_set('b', 0.2)])
+    assert coalesced == [volume_set('a', 0.2), volume_set('b', 0.1), volume_set('b', 0.2)]
+    assert saved == 0
+
+
+def test_coalesce_window(hass):
+    """Media player changes within the coalesce window are handled together, with the latest state."""
+    async def async_test():
+        entity = await async_setup_speaker(hass, 0.2, coalesce_window=1.)
+
+        for volume_level in (0.3, 0.4, 0.6):
+            await async_set_media_player(hass, volume_level)
+
+        assert attribute(hass, 'speaker', 'value') == 20.
+        assert entity.coalesced_events == 2
+
+        await hass.async_advance(1.)
+        assert attribute(hass, 'speaker', 'value') == 60.
+        assert attribute(hass, 'speaker', 'volume_level') == 0.6
+
+    hass.loop.run_until_complete(async_test())
+
+
+def test_echo_suppression(hass):
+    """A stale report of a volume level that the tracker set isn't mistaken for a change on the device."""
+    async def async_test():
+        entity = await async_setup_speaker(hass, 0.2)
+
+        await async_volume_set(hass, 'speaker', 0.3)
+        await async_volume_set(hass, 'speaker', 0.5)
+        assert media_player_calls(hass) == [(['media_player.speaker'], 0.3), (['media_player.speaker'], 0.5)]
+
+        # the media player catches up with the commands
+        await async_set_media_player(hass, 0.3)
+        assert attribute(hass, 'speaker', 'value') == 50.
+
+        await async_set_media_player(hass, 0.5)
+        assert attribute(hass, 'speaker', 'value') == 50.
+        assert entity.statistics['transitions'][cast_volume_tracker.TRANSITION_ECHO] == 1
+        assert len(media_player_calls(hass)) == 2
+
+        # a change on the device
+        await async_set_media_player(hass, 0.7)
+        assert attribute(hass, 'speaker', 'value') == 70.
+
+    hass.loop.run_until_complete(async_test())
+
+
+def test_volume_set_many_speaker_overrides_group(hass):
+    """A speaker's level in ``volume_set_many`` takes precedence over its group's level."""
+    async def async_test():
+        await hass.async_setup_cast_volume_trackers(KITCHEN_CONFIG)
+        await hass.services.async_call(MEDIA_PLAYER_DOMAIN, SERVICE_TURN_ON, {ATTR_ENTITY_ID: 'media_player.kitchen_speakers'}, blocking=True)
+        await hass.async_block_till_done()
+        del hass.services.calls[:]
+
+        await hass.services.async_call(cast_volume_tracker.DOMAIN, cast_volume_tracker.SERVICE_VOLUME_SET_MANY, {cast_volume_tracker.ATTR_VOLUME_LEVELS: {entity_id('kitchen_home'): 0.6, entity_id('kitchen_speakers'): 0.4}}, blocking=True)
+        await hass.async_block_till_done()
+
+        assert attribute(hass, 'kitchen_home', 'value') == 60.
+        assert attribute(hass, 'computer_speakers', 'value') == 40.
+        assert hass.states.get('media_player.kitchen_home').attributes[ATTR_MEDIA_VOLUME_LEVEL] == 0.6
+        assert hass.states.get('media_player.computer_speakers').attributes[ATTR_MEDIA_VOLUME_LEVEL] == 0.4
+
+        # one call per speaker; the group level that was superseded for `kitchen_home` isn't sent
+        assert sorted(media_player_calls(hass)) == [(['media_player.computer_speakers'], 0.4), (['media_player.kitchen_home'], 0.6)]
+
+    hass.loop.run_until_complete(async_test())
+
+
+def test_snapshot_and_restore(hass):
+    """Restoring a snapshot brings back the saved attributes and only sends calls to the speakers that changed."""
+    async def async_test():
+        await hass.async_setup_cast_volume_trackers(KITCHEN_CONFIG)
+        await hass.services.async_call(MEDIA_PLAYER_DOMAIN, SERVICE_TURN_ON, {ATTR_ENTITY_ID: 'media_player.kitchen_home'}, blocking=True)
+        await hass.services.async_call(MEDIA_PLAYER_DOMAIN, SERVICE_TURN_ON, {ATTR_ENTITY_ID: 'media_player.computer_speakers'}, blocking=True)
+        await hass.async_block_till_done()
+        for object_id in ('kitchen_home', 'computer_speakers'):
+            await hass.services.async_call(cast_volume_tracker.DOMAIN, SERVICE_VOLUME_MUTE, {ATTR_ENTITY_ID: entity_id(object_id), ATTR_MEDIA_VOLUME_MUTED: False}, blocking=True)
+        await async_volume_set(hass, 'kitchen_home', 0.3)
+        await async_volume_set(hass, 'computer_speakers', 0.5)
+
+        await hass.services.async_call(cast_volume_tracker.DOMAIN, cast_volume_tracker.SERVICE_SNAPSHOT, {ATTR_ENTITY_ID: entity_id('kitchen_speakers')}, blocking=True)
+        await async_volume_set(hass, 'kitchen_home', 0.8)
+        await hass.services.async_call(cast_volume_tracker.DOMAIN, SERVICE_VOLUME_MUTE, {ATTR_ENTITY_ID: entity_id('computer_speakers'), ATTR_MEDIA_VOLUME_MUTED: True}, blocking=True)
+        await hass.async_block_till_done()
+        del hass.services.calls[:]
+
+        await hass.services.async_call(cast_volume_tracker.DOMAIN, cast_volume_tracker.SERVICE_RESTORE, {ATTR_ENTITY_ID: entity_id('kitchen_speakers')}, blocking=True)
+        await hass.async_block_till_done()
+
+        assert [(attribute(hass, object_id, 'value'), attribute(hass, object_id, 'is_volume_muted')) for object_id in ('kitchen_home', 'computer_speakers')] == [(30., False), (50., False)]
+        assert sorted(media_player_calls(hass)) == [(['media_player.computer_speakers'], 0.5), (['media_player.kitchen_home'], 0.3)]
+
+    hass.loop.run_until_complete(async_test())
+
+
+def test_nested_group_turns_on_at_the_average_of_its_speakers(hass):
+    """When a group of groups turns on, the member groups that are off contribute the average of their speakers."""
+    async def async_test():
+        await hass.async_setup_cast_volume_trackers({
+            'house': {'name': 'House', 'members': ['kitchen', 'den']},
+            'kitchen': {'name': 'Kitchen', 'members': ['kitchen_1', 'kitchen_2']},
+            'den': {'name': 'Den', 'members': ['den_1', 'den_2']},
+            'kitchen_1': {'name': 'Kitchen 1', 'parents': ['kitchen']},
+            'kitchen_2': {'name': 'Kitchen 2', 'parents': ['kitchen']},
+            'den_1': {'name': 'Den 1', 'parents': ['den']},
+            'den_2': {'name': 'Den 2', 'parents': ['den']}})
+
+        for object_id, volume_level in (('kitchen_1', 0.2), ('kitchen_2', 0.4), ('den_1', 0.6), ('den_2', 0.8)):
+            await async_volume_set(hass, object_id, volume_level)
+        assert [attribute(hass, object_id, 'value') for object_id in ('kitchen_1', 'kitchen_2', 'den_1', 'den_2')] == [20., 40., 60., 80.]
+        del hass.services.calls[:]
+
+        await hass.services.async_call(MEDIA_PLAYER_DOMAIN, SERVICE_TURN_ON, {ATTR_ENTITY_ID: 'media_player.house'}, blocking=True)
+        await hass.async_block_till_done()
+
+        assert attribute(hass, 'house', 'value') == 50.
+        assert [attribute(hass, object_id, 'value') for object_id in ('kitchen_1', 'kitchen_2', 'den_1', 'den_2')] == [50., 50., 50., 50.]
+        assert sorted(media_player_calls(hass)) == [(['media_player.den_1', 'media_player.den_2', 'media_player.kitchen_1', 'media_player.kitchen_2'], 0.5)]
+
+    hass.loop.run_until_complete(async_test())
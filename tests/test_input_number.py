@@ -0,0 +1,215 @@
+"""Tests for the ``input_number`` component's template numbers, run against Home Assistant."""
+import asyncio
+from datetime import timedelta
+import os
+import sys
+
+import pytest
+
+from homeassistant.const import ATTR_NOW, EVENT_HOMEASSISTANT_START, EVENT_TIME_CHANGED, MATCH_ALL
+from homeassistant.core import HomeAssistant
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.template import Template
+import homeassistant.util.dt as dt_util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import input_number  # noqa: E402  pylint: disable=wrong-import-position
+
+# a script that is suspended at its `delay` step
+DELAYED_SCRIPT = [{'event': 'step_1', 'event_data_template': {'value': '{{ value }}'}},
+                  {'delay': '00:00:01'},
+                  {'event': 'step_2', 'event_data_template': {'value': '{{ value }}'}}]
+
+# templates whose entities can't be extracted from their source, so they are discovered when they are rendered
+MATCH_ALL_TEMPLATE = "{{% set entity_id = 'sensor.{}' %}}{{{{ states(entity_id) | float }}}}"
+
+
+@pytest.fixture
+def hass(tmpdir):
+    """Get a Home Assistant instance with its own event loop."""
+    loop = asyncio.new_event_loop()
+    hass = HomeAssistant(loop)
+    hass.config.config_dir = str(tmpdir)
+    yield hass
+    loop.run_until_complete(hass.async_stop(force=True))
+    loop.close()
+
+
+async def async_setup_template_numbers(hass, config):
+    """Set up the template numbers and start Home Assistant."""
+    assert await input_number.async_setup(hass, input_number.CONFIG_SCHEMA({input_number.DOMAIN: config}))
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_START)
+    await hass.async_block_till_done()
+
+
+async def async_settle():
+    """Let the event loop run the pending callbacks and tasks (suspended scripts would block `async_block_till_done`)."""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def template_number_config(value_template):
+    """Get the configuration for a template number."""
+    return {'min': 0, 'max': 100, 'value_template': value_template, 'set_value_script': [{'event': 'set_value'}]}
+
+
+def test_match_all_templates_discover_their_entities(hass):
+    """Templates with unknown entities discover and track them, even if the template environment already exists."""
+    assert Template(MATCH_ALL_TEMPLATE.format('b'), hass).extract_entities() == MATCH_ALL
+
+    async def async_test():
+        for object_id, state in (('a', 1), ('b', 2), ('c', 3)):
+            hass.states.async_set('sensor.' + object_id, state)
+
+        # an ordinary template renders first, so the shared template environment is created before the others render
+        assert Template("{{ states('sensor.a') }}", hass).async_render() == '1'
+
+        await async_setup_template_numbers(hass, {
+            'plain': template_number_config("{{ states('sensor.a') | float }}"),
+            'match_all_1': template_number_config(MATCH_ALL_TEMPLATE.format('b')),
+            'match_all_2': template_number_config(MATCH_ALL_TEMPLATE.format('c'))})
+
+        assert [float(hass.states.get('input_number.' + object_id).state) for object_id in ('plain', 'match_all_1', 'match_all_2')] == [1., 2., 3.]
+
+        hass.states.async_set('sensor.b', 5)
+        await hass.async_block_till_done()
+        assert [float(hass.states.get('input_number.' + object_id).state) for object_id in ('plain', 'match_all_1', 'match_all_2')] == [1., 5., 3.]
+
+        hass.states.async_set('sensor.c', 7)
+        hass.states.async_set('sensor.a', 4)
+        await hass.async_block_till_done()
+        assert [float(hass.states.get('input_number.' + object_id).state) for object_id in ('plain', 'match_all_1', 'match_all_2')] == [4., 5., 7.]
+
+    hass.loop.run_until_complete(async_test())
+
+
+def test_entity_ids_keep_each_templates_entities(hass, monkeypatch):
+    """With ``entity_id`` given, a template is only rendered when one of its own (or an unmentioned listed) entity changes."""
+    config = template_number_config("{{ states('sensor.a') | float }}")
+    config['icon_template'] = "{{ 'mdi:check' if is_state('sensor.b', 'on') else 'mdi:close' }}"
+    config['entity_id'] = ['sensor.a', 'sensor.b', 'sensor.c']
+
+    renders = []
+    render = input_number.TemplateNumber._render  # pylint: disable=protected-access
+
+    def record_render(self, template, recorder):
+        renders.append('value' if template.template == config['value_template'] else 'icon')
+        return render(self, template, recorder)
+
+    monkeypatch.setattr(input_number.TemplateNumber, '_render', record_render)
+
+    async def async_test():
+        hass.states.async_set('sensor.a', 1)
+        hass.states.async_set('sensor.b', 'on')
+        await async_setup_template_numbers(hass, {'number': config})
+        assert renders == ['value', 'icon']
+        del renders[:]
+
+        hass.states.async_set('sensor.a', 2)
+        await hass.async_block_till_done()
+        assert renders == ['value']
+        assert float(hass.states.get('input_number.number').state) == 2.
+
+        hass.states.async_set('sensor.b', 'off')
+        await hass.async_block_till_done()
+        assert renders == ['value', 'icon']
+        assert hass.states.get('input_number.number').attributes['icon'] == 'mdi:close'
+
+        # a listed entity that neither template mentions may be used by both of them
+        hass.states.async_set('sensor.c', 1)
+        await hass.async_block_till_done()
+        assert renders == ['value', 'icon', 'value', 'icon']
+
+    hass.loop.run_until_complete(async_test())
+
+
+@pytest.mark.parametrize('mode, max_runs, expected', [
+    (input_number.SCRIPT_MODE_QUEUED, 10, [('step_1', '1'), ('step_2', '1'), ('step_1', '2'), ('step_2', '2'), ('step_1', '3'), ('step_2', '3')]),
+    (input_number.SCRIPT_MODE_QUEUE_LATEST, 10, [('step_1', '1'), ('step_2', '1'), ('step_1', '3'), ('step_2', '3')]),
+    (input_number.SCRIPT_MODE_PARALLEL, 2, [('step_1', '1'), ('step_1', '2'), ('step_2', '1'), ('step_2', '2')]),
+    (input_number.SCRIPT_MODE_RESTART, 10, [('step_1', '1'), ('step_1', '2'), ('step_1', '3'), ('step_2', '3')])])
+def test_script_modes_track_whole_runs(hass, mode, max_runs, expected):
+    """A run that is suspended at a ``delay`` step is only finished once its last step has run."""
+    async def async_test():
+        events = []
+        for event_type in ('step_1', 'step_2'):
+            hass.bus.async_listen(event_type, lambda event: events.append((event.event_type, event.data['value'])))
+
+        runner = input_number.ScriptRunner(hass, cv.SCRIPT_SCHEMA(DELAYED_SCRIPT), mode, max_runs)
+        tasks = []
+        for value in (1, 2, 3):
+            tasks.append(hass.loop.create_task(runner.async_run({'value': value})))
+            await async_settle()
+
+        # fire `time_changed` events until every run has finished
+        now = dt_util.utcnow()
+        for seconds in range(2, 20, 2):
+            hass.bus.async_fire(EVENT_TIME_CHANGED, {ATTR_NOW: now + timedelta(seconds=seconds)})
+            await async_settle()
+
+        assert all(task.done() for task in tasks)
+        assert events == expected
+
+    hass.loop.run_until_complete(async_test())
+
+
+def test_queued_run_returns_when_suspended(hass):
+    """A queued run returns at its ``delay`` step, like ``Script.async_run``, and the next run waits for it to finish."""
+    async def async_test():
+        events = []
+        for event_type in ('step_1', 'step_2'):
+            hass.bus.async_listen(event_type, lambda event: events.append((event.event_type, event.data['value'])))
+
+        runner = input_number.ScriptRunner(hass, cv.SCRIPT_SCHEMA(DELAYED_SCRIPT), input_number.SCRIPT_MODE_QUEUED, 10)
+        tasks = [hass.loop.create_task(runner.async_run({'value': value})) for value in (1, 2)]
+        await async_settle()
+        assert [task.done() for task in tasks] == [True, False]
+        assert events == [('step_1', '1')]
+
+        now = dt_util.utcnow()
+        hass.bus.async_fire(EVENT_TIME_CHANGED, {ATTR_NOW: now + timedelta(seconds=2)})
+        await async_settle()
+        assert [task.done() for task in tasks] == [True, True]
+        assert events == [('step_1', '1'), ('step_2', '1'), ('step_1', '2')]
+
+        hass.bus.async_fire(EVENT_TIME_CHANGED, {ATTR_NOW: now + timedelta(seconds=4)})
+        await async_settle()
+        assert events == [('step_1', '1'), ('step_2', '1'), ('step_1', '2'), ('step_2', '2')]
+
+    hass.loop.run_until_complete(async_test())
+
+
+def test_restart_caller_can_be_cancelled(hass):
+    """Cancelling the caller of a run in ``restart`` mode isn't mistaken for the run being superseded."""
+    async def async_test():
+        runner = input_number.ScriptRunner(hass, cv.SCRIPT_SCHEMA(DELAYED_SCRIPT), input_number.SCRIPT_MODE_RESTART, 10)
+        task = hass.loop.create_task(runner.async_run({'value': 1}))
+        await async_settle()
+        assert not task.done()
+
+        task.cancel()
+        await async_settle()
+        assert task.cancelled()
+
+        # the script itself still finishes its run
+        hass.bus.async_fire(EVENT_TIME_CHANGED, {ATTR_NOW: dt_util.utcnow() + timedelta(seconds=2)})
+        await async_settle()
+
+    hass.loop.run_until_complete(async_test())
+
+
+def test_dispatcher_unsubscribe_removes_empty_entries(hass):
+    """Unsubscribing removes the entity IDs that no longer have subscribers from the index."""
+    dispatcher = input_number.StateChangeDispatcher(hass)
+    unsub_1 = dispatcher.async_subscribe(['sensor.a', 'sensor.b'], lambda *args: None)
+    unsub_2 = dispatcher.async_subscribe(['sensor.b'], lambda *args: None)
+    unsub_3 = dispatcher.async_subscribe(MATCH_ALL, lambda *args: None)
+
+    unsub_1()
+    assert list(dispatcher.subscribers) == ['sensor.b']
+
+    unsub_2()
+    unsub_3()
+    assert dispatcher.subscribers == {}
+    assert dispatcher.wildcard_subscribers == []
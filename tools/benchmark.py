@@ -0,0 +1,123 @@
+"""Microbenchmarks for the ``cast_volume_tracker`` component, driven by the in-process fake Home Assistant.
+
+Example::
+
+    python tools/benchmark.py --groups 4 --speakers 8 --events 2000
+
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from homeassistant.const import ATTR_ENTITY_ID, SERVICE_VOLUME_MUTE, SERVICE_VOLUME_SET
+from homeassistant.components.media_player.const import ATTR_MEDIA_VOLUME_LEVEL, ATTR_MEDIA_VOLUME_MUTED
+from homeassistant.components.media_player.const import DOMAIN as MEDIA_PLAYER_DOMAIN
+
+from fake_hass import FakeHass, cast_volume_tracker
+
+
+def make_topology(groups, speakers):
+    """Make a ``cast_volume_tracker`` configuration with ``groups`` groups of ``speakers`` speakers each."""
+    config = {}
+    for g in range(groups):
+        group = 'group_{}'.format(g)
+        members = ['speaker_{}_{}'.format(g, s) for s in range(speakers)]
+        for member in members:
+            config[member] = {'name': member, 'parents': [group]}
+
+        config[group] = {'name': group, 'members': members}
+
+    return config
+
+
+async def async_run_event(hass, rnd, config):
+    """Perform a random event.
+
+    Returns
+    -------
+    int
+        The number of service calls that were made in order to perform the event (i.e., that shouldn't be counted)
+
+    """
+    object_id = rnd.choice(list(config))
+    media_player = hass.media_players['{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id)]
+    r = rnd.random()
+
+    # turn the device on/off
+    if r < 0.2:
+        if media_player.state == 'off':
+            media_player.turn_on()
+        else:
+            media_player.turn_off()
+        return 0
+
+    # change the volume on the device
+    if r < 0.5:
+        media_player.volume_set(round(rnd.random(), 2))
+        return 0
+
+    # set the volume via the cast volume tracker
+    if r < 0.9:
+        await hass.services.async_call(cast_volume_tracker.DOMAIN, SERVICE_VOLUME_SET, {ATTR_ENTITY_ID: cast_volume_tracker.ENTITY_ID_FORMAT.format(object_id), ATTR_MEDIA_VOLUME_LEVEL: round(rnd.random(), 2)})
+        return 1
+
+    # mute/un-mute via the cast volume tracker
+    await hass.services.async_call(cast_volume_tracker.DOMAIN, SERVICE_VOLUME_MUTE, {ATTR_ENTITY_ID: cast_volume_tracker.ENTITY_ID_FORMAT.format(object_id), ATTR_MEDIA_VOLUME_MUTED: rnd.random() < 0.5})
+    return 1
+
+
+async def async_benchmark(groups, speakers, events, seed):
+    """Run the benchmark and return the results."""
+    config = make_topology(groups, speakers)
+    with FakeHass() as hass:
+        await hass.async_setup_cast_volume_trackers(config)
+
+        rnd = random.Random(seed)
+        latencies = []
+        service_calls = []
+        media_player_calls = []
+
+        start = time.perf_counter()
+        for _ in range(events):
+            num_calls = len(hass.services.calls)
+            event_start = time.perf_counter()
+
+            num_calls += await async_run_event(hass, rnd, config)
+            await hass.async_block_till_done()
+
+            latencies.append(time.perf_counter() - event_start)
+            service_calls.append(len(hass.services.calls) - num_calls)
+            media_player_calls.append(sum(domain == MEDIA_PLAYER_DOMAIN for domain, _, _ in hass.services.calls[num_calls:]))
+
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    return {'trackers': len(config),
+            'events': events,
+            'events/sec': events / elapsed,
+            'service calls/event': statistics.mean(service_calls),
+            'media player calls/event': statistics.mean(media_player_calls),
+            'latency p50 (ms)': 1000. * latencies[len(latencies) // 2],
+            'latency p95 (ms)': 1000. * latencies[int(0.95 * (len(latencies) - 1))],
+            'latency max (ms)': 1000. * latencies[-1]}
+
+
+def main():
+    """Parse the command line arguments, run the benchmark, and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groups', type=int, default=4, help='the number of cast groups')
+    parser.add_argument('--speakers', type=int, default=8, help='the number of speakers per group')
+    parser.add_argument('--events', type=int, default=1000, help='the number of random events')
+    parser.add_argument('--seed', type=int, default=0, help='the random seed')
+    args = parser.parse_args()
+
+    results = asyncio.get_event_loop().run_until_complete(async_benchmark(args.groups, args.speakers, args.events, args.seed))
+    for key, val in results.items():
+        print('{:<26}{:>12.3f}'.format(key, val) if isinstance(val, float) else '{:<26}{:>12}'.format(key, val))
+
+
+if __name__ == '__main__':
+    main()
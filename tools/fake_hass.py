@@ -0,0 +1,454 @@
+"""A lightweight, in-process stand-in for Home Assistant that can drive the ``cast_volume_tracker`` component.
+
+It provides a state machine, an event bus, a service registry that records every call, and simulated media players,
+so that ``CastNetwork``, the ``CastVolumeTracker*`` classes, and ``CastVolumeTrackerEntity`` can be exercised without
+any cast devices.  Use it as a context manager, so that Home Assistant's timers follow its virtual clock::
+
+    with FakeHass() as hass:
+        await hass.async_setup_cast_volume_trackers(trackers_config)
+
+"""
+import asyncio
+from datetime import timedelta
+import logging
+import os
+import sys
+
+from homeassistant.const import ATTR_ENTITY_ID, ATTR_NOW, EVENT_HOMEASSISTANT_START, EVENT_STATE_CHANGED, EVENT_TIME_CHANGED, SERVICE_TURN_OFF, SERVICE_TURN_ON, SERVICE_VOLUME_MUTE, SERVICE_VOLUME_SET, STATE_OFF, STATE_PLAYING
+from homeassistant.components.media_player.const import ATTR_MEDIA_VOLUME_LEVEL, ATTR_MEDIA_VOLUME_MUTED
+from homeassistant.components.media_player.const import DOMAIN as MEDIA_PLAYER_DOMAIN
+from homeassistant.core import Config, Event, State
+from homeassistant.helpers.restore_state import DATA_RESTORE_STATE_TASK
+import homeassistant.util.dt as dt_util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cast_volume_tracker  # noqa: E402  pylint: disable=wrong-import-position
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# =========================================================================== #
+#                                                                             #
+#                               State machine                                 #
+#                                                                             #
+# =========================================================================== #
+class FakeStateMachine(object):
+    """A state machine that fires ``state_changed`` events on the fake bus."""
+
+    def __init__(self, bus):
+        self._bus = bus
+        self._states = {}
+
+    def get(self, entity_id):
+        """Get the state of an entity."""
+        return self._states.get(entity_id.lower())
+
+    def async_all(self):
+        """Get all of the states."""
+        return list(self._states.values())
+
+    def entity_ids(self, domain_filter=None):
+        """Get the entity IDs, optionally filtered by domain."""
+        if domain_filter is None:
+            return list(self._states)
+
+        return [entity_id for entity_id in self._states if entity_id.startswith(domain_filter + '.')]
+
+    def is_state(self, entity_id, state):
+        """Whether or not an entity is in the given state."""
+        state_obj = self.get(entity_id)
+        return state_obj is not None and state_obj.state == state
+
+    def async_set(self, entity_id, new_state, attributes=None, force_update=False, context=None):
+        """Set the state of an entity and fire a ``state_changed`` event if it changed."""
+        entity_id = entity_id.lower()
+        new_state = str(new_state)
+        attributes = dict(attributes or {})
+
+        old_state = self._states.get(entity_id)
+        if old_state is not None and old_state.state == new_state and old_state.attributes == attributes and not force_update:
+            return
+
+        state = State(entity_id, new_state, attributes)
+        self._states[entity_id] = state
+        self._bus.async_fire(EVENT_STATE_CHANGED, {'entity_id': entity_id, 'old_state': old_state, 'new_state': state})
+
+
+# =========================================================================== #
+#                                                                             #
+#                                 Event bus                                   #
+#                                                                             #
+# =========================================================================== #
+class FakeBus(object):
+    """An event bus that calls its listeners synchronously."""
+
+    def __init__(self, hass):
+        self._hass = hass
+        self._listeners = {}
+
+    def async_listen(self, event_type, listener):
+        """Listen for events of the given type."""
+        self._listeners.setdefault(event_type, []).append(listener)
+
+        def remove_listener():
+            """Stop listening."""
+            if listener in self._listeners.get(event_type, []):
+                self._listeners[event_type].remove(listener)
+
+        return remove_listener
+
+    def async_listen_once(self, event_type, listener):
+        """Listen for a single event of the given type."""
+        def one_time_listener(event):
+            """Remove the listener and then call it."""
+            remove_listener()
+            return listener(event)
+
+        remove_listener = self.async_listen(event_type, one_time_listener)
+        return remove_listener
+
+    def async_fire(self, event_type, event_data=None, origin=None, context=None):
+        """Fire an event."""
+        event = Event(event_type, event_data or {})
+        for listener in list(self._listeners.get(event_type, [])):
+            self._hass.async_run_job(listener, event)
+
+
+# =========================================================================== #
+#                                                                             #
+#                              Service registry                               #
+#                                                                             #
+# =========================================================================== #
+class FakeServiceCall(object):
+    """A service call, as passed to service handlers."""
+
+    def __init__(self, domain, service, data=None, context=None):
+        self.domain = domain
+        self.service = service
+        self.data = data or {}
+        self.context = context
+
+
+class FakeServiceRegistry(object):
+    """A service registry that records every call; blocking calls are performed inline, others are scheduled."""
+
+    def __init__(self, hass):
+        self._hass = hass
+        self._services = {}
+
+        # `(domain, service, service_data)` tuples for every call that was made
+        self.calls = []
+
+    def has_service(self, domain, service):
+        """Whether or not the service is registered."""
+        return (domain, service) in self._services
+
+    def async_register(self, domain, service, service_func, schema=None):
+        """Register a service."""
+        self._services[(domain, service)] = (service_func, schema)
+
+    async def async_call(self, domain, service, service_data=None, blocking=False, context=None):
+        """Record a service call and perform it (if ``blocking``) or schedule it, like Home Assistant does."""
+        service_data = dict(service_data or {})
+        self.calls.append((domain, service, service_data))
+
+        service_func, schema = self._services[(domain, service)]
+        if schema is not None:
+            service_data = schema(service_data)
+
+        service_call = FakeServiceCall(domain, service, service_data, context)
+        if not blocking:
+            self._hass.async_create_task(self._async_safe_execute(service_func, service_call))
+            return None
+
+        await self._async_execute(service_func, service_call)
+        return True
+
+    @staticmethod
+    async def _async_execute(service_func, service_call):
+        """Call the service handler."""
+        result = service_func(service_call)
+        if asyncio.iscoroutine(result):
+            await result
+
+    async def _async_safe_execute(self, service_func, service_call):
+        """Call the service handler and log any exception."""
+        try:
+            await self._async_execute(service_func, service_call)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error executing service %s.%s", service_call.domain, service_call.service)
+
+
+# =========================================================================== #
+#                                                                             #
+#                          Simulated media players                            #
+#                                                                             #
+# =========================================================================== #
+class FakeMediaPlayer(object):
+    """A simulated cast device.
+
+    Turning a cast group on/off turns its members on/off.  While a cast group is playing, it reports the average volume
+    level of its members, and setting its volume sets the volume of all of its members.  As in Home Assistant, a media
+    player that is off has no attributes.
+
+    """
+
+    def __init__(self, hass, object_id, volume_level=0., members=None):
+        self.hass = hass
+        self.entity_id = '{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id)
+        self.state = STATE_OFF
+        self.volume_level = volume_level
+        self.is_volume_muted = False
+
+        # cast groups
+        self.members = members or []
+        self.groups = []
+        for member in self.members:
+            member.groups.append(self)
+
+    def write_state(self):
+        """Write the media player's state to the state machine (like Home Assistant, without attributes when off)."""
+        if self.state == STATE_OFF:
+            self.hass.states.async_set(self.entity_id, self.state)
+        else:
+            self.hass.states.async_set(self.entity_id, self.state, {ATTR_MEDIA_VOLUME_LEVEL: self.volume_level, ATTR_MEDIA_VOLUME_MUTED: self.is_volume_muted})
+
+        for group in self.groups:
+            if group.state != STATE_OFF:
+                group.volume_level = sum(member.volume_level for member in group.members) / len(group.members)
+                group.write_state()
+
+    def turn_on(self):
+        """Start playing."""
+        self.state = STATE_PLAYING
+        for member in self.members:
+            member.turn_on()
+
+        if self.members:
+            self.volume_level = sum(member.volume_level for member in self.members) / len(self.members)
+        self.write_state()
+
+    def turn_off(self):
+        """Stop playing."""
+        self.state = STATE_OFF
+        self.write_state()
+
+        for member in self.members:
+            member.turn_off()
+
+    def volume_set(self, volume_level):
+        """Set the volume (e.g., from the Google Home app or a button on the device)."""
+        if self.members and self.state != STATE_OFF:
+            for member in self.members:
+                member.volume_set(volume_level)
+            return
+
+        self.volume_level = volume_level
+        self.write_state()
+
+    def volume_mute(self, is_volume_muted):
+        """Mute/Un-mute the device."""
+        self.is_volume_muted = is_volume_muted
+        self.write_state()
+
+
+# =========================================================================== #
+#                                                                             #
+#                                 Fake hass                                   #
+#                                                                             #
+# =========================================================================== #
+class FakeRestoreStateData(object):
+    """Stand-in for ``RestoreStateData`` that has no saved states."""
+
+    def __init__(self):
+        self.last_states = {}
+
+    def async_restore_entity_added(self, entity_id):
+        """Ignore added entities."""
+
+    def async_restore_entity_removed(self, entity_id):
+        """Ignore removed entities."""
+
+
+class FakeHass(object):
+    """An in-process stand-in for ``HomeAssistant``."""
+
+    def __init__(self, loop=None, config_dir=None):
+        self.loop = loop or asyncio.get_event_loop()
+        self.config = Config(self)
+        self.config.config_dir = config_dir or os.getcwd()
+        self.data = {}
+
+        # virtual time (in seconds), which only advances when `async_advance` is called; Home Assistant's timers
+        # (e.g., `async_call_later`) are scheduled against `dt_util.utcnow`, which follows the virtual clock while the
+        # instance is used as a context manager
+        self.now = 0.
+        self.start_time = dt_util.utcnow()
+        self._utcnow = None
+        self.bus = FakeBus(self)
+        self.states = FakeStateMachine(self.bus)
+        self.services = FakeServiceRegistry(self)
+        self.media_players = {}
+        self._pending = set()
+
+        restore_state_data = self.loop.create_future()
+        restore_state_data.set_result(FakeRestoreStateData())
+        self.data[DATA_RESTORE_STATE_TASK] = restore_state_data
+
+        for service in (SERVICE_TURN_ON, SERVICE_TURN_OFF, SERVICE_VOLUME_MUTE, SERVICE_VOLUME_SET):
+            self.services.async_register(MEDIA_PLAYER_DOMAIN, service, self._handle_media_player_service)
+
+    def __enter__(self):
+        """Make ``dt_util.utcnow`` follow the virtual clock."""
+        self._utcnow, dt_util.utcnow = dt_util.utcnow, self.utcnow
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Restore ``dt_util.utcnow``."""
+        dt_util.utcnow, self._utcnow = self._utcnow, None
+
+    # ------------------------------------------------------------------- #
+    #                               Tasks                                 #
+    # ------------------------------------------------------------------- #
+    def async_create_task(self, target):
+        """Schedule a coroutine and keep track of it."""
+        task = self.loop.create_task(target)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    def async_add_job(self, target, *args):
+        """Run a callback or schedule a coroutine (function)."""
+        if asyncio.iscoroutine(target):
+            return self.async_create_task(target)
+
+        result = target(*args)
+        if asyncio.iscoroutine(result):
+            return self.async_create_task(result)
+
+        return None
+
+    async_run_job = async_add_job
+
+    def async_add_executor_job(self, target, *args):
+        """Run a function in the default executor."""
+        return self.loop.run_in_executor(None, target, *args)
+
+    async def async_block_till_done(self):
+        """Wait until there are no more pending tasks."""
+        while self._pending:
+            await asyncio.wait(list(self._pending))
+
+    # ------------------------------------------------------------------- #
+    #                           Virtual clock                             #
+    # ------------------------------------------------------------------- #
+    def clock(self):
+        """Get the virtual time, in seconds."""
+        return self.now
+
+    def utcnow(self):
+        """Get the virtual time as an aware UTC datetime."""
+        return self.start_time + timedelta(seconds=self.now)
+
+    async def async_advance(self, seconds):
+        """Advance the virtual clock, firing a ``time_changed`` event for every second that elapses."""
+        await self.async_block_till_done()
+
+        end = self.now + seconds
+        while self.now < end:
+            self.now = min(self.now + 1., end)
+            self.bus.async_fire(EVENT_TIME_CHANGED, {ATTR_NOW: self.utcnow()})
+            await self.async_block_till_done()
+
+    # ------------------------------------------------------------------- #
+    #                           Media players                             #
+    # ------------------------------------------------------------------- #
+    def add_media_player(self, object_id, volume_level=0., members=None):
+        """Add a simulated media player; ``members`` are the object IDs of the members of a cast group."""
+        members = [self.media_players['{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, member)] for member in members or []]
+        media_player = FakeMediaPlayer(self, object_id, volume_level, members)
+        self.media_players[media_player.entity_id] = media_player
+        media_player.write_state()
+        return media_player
+
+    def _handle_media_player_service(self, call):
+        """Perform a ``media_player`` service call on the simulated media players (other media players are ignored)."""
+        entity_ids = call.data.get(ATTR_ENTITY_ID, list(self.media_players))
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_id.strip() for entity_id in entity_ids.split(',')]
+
+        for entity_id in entity_ids:
+            media_player = self.media_players.get(entity_id)
+            if media_player is None:
+                continue
+
+            if call.service == SERVICE_TURN_ON:
+                media_player.turn_on()
+            elif call.service == SERVICE_TURN_OFF:
+                media_player.turn_off()
+            elif call.service == SERVICE_VOLUME_MUTE:
+                media_player.volume_mute(call.data[ATTR_MEDIA_VOLUME_MUTED])
+            else:
+                media_player.volume_set(call.data[ATTR_MEDIA_VOLUME_LEVEL])
+
+    # ------------------------------------------------------------------- #
+    #                       Cast volume trackers                          #
+    # ------------------------------------------------------------------- #
+    @staticmethod
+    def _entity_service_handler(entities, method):
+        """Create a handler that calls ``method`` on the targeted entities (default: all), like an entity service."""
+        async def async_handle_entity_service(call):
+            """Call the entity method with the service data (other than the entity IDs)."""
+            data = {key: value for key, value in call.data.items() if key != ATTR_ENTITY_ID}
+            for entity_id in call.data.get(ATTR_ENTITY_ID, list(entities)):
+                await getattr(entities[entity_id], method)(**data)
+
+        return async_handle_entity_service
+
+    async def async_setup_cast_volume_trackers(self, trackers_config, snapshot=None, simulate_media_players=True, start=True):
+        """Set up cast volume trackers (and their media players) and start the fake Home Assistant instance.
+
+        Parameters
+        ----------
+        trackers_config : dict
+            The ``cast_volume_tracker`` configuration, i.e., a dictionary with object IDs as keys
+        snapshot : dict, None
+            A snapshot of the trackers, as stored by the component (see ``CastNetwork.snapshot``)
+        simulate_media_players : bool
+            Whether to add simulated media players; if not, the media player states must be set directly and the
+            ``media_player`` service calls are only recorded
+        start : bool
+            Whether to fire the ``homeassistant_start`` event; if not, the caller must fire it
+
+        Returns
+        -------
+        entities : dict
+            A dictionary with entity IDs as keys and ``CastVolumeTrackerEntity`` objects as values
+
+        """
+        config = cast_volume_tracker.CONFIG_SCHEMA({cast_volume_tracker.DOMAIN: trackers_config})
+
+        # add members before their groups
+        if simulate_media_players:
+            for object_id in cast_volume_tracker.members_first(trackers_config):
+                if '{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id) not in self.media_players:
+                    self.add_media_player(object_id, members=trackers_config[object_id].get(cast_volume_tracker.CONF_MEMBERS))
+
+        entities = {entity.entity_id: entity for entity in cast_volume_tracker.setup_networks(self, config[cast_volume_tracker.DOMAIN], snapshot, clock=self.clock)}
+        for entity in entities.values():
+            entity.hass = self
+            await entity.async_added_to_hass()
+            await entity.async_update_ha_state()
+
+        # the entity services, as registered by the component's `EntityComponent`, and the component's own services
+        for service, schema, method in cast_volume_tracker.ENTITY_SERVICES:
+            self.services.async_register(cast_volume_tracker.DOMAIN, service, self._entity_service_handler(entities, method), schema)
+
+        cast_volume_tracker.async_register_services(self)
+
+        if start:
+            self.bus.async_fire(EVENT_HOMEASSISTANT_START)
+            await self.async_block_till_done()
+
+        return entities
@@ -0,0 +1,168 @@
+"""Replay a trace recorded by the ``cast_volume_tracker`` component against the fake Home Assistant on a virtual clock.
+
+The trackers start from the attributes and media player states in the trace's ``start`` records.  The recorded media
+player state changes and ``cast_volume_tracker`` service calls are then fed back through the trackers at their recorded
+times (inputs with no outputs between them are fed back together, as they were handled together), and the resulting
+tracker decisions and service calls are compared with the ones in the trace.
+
+Example::
+
+    python tools/replay_trace.py cast_volume_tracker_trace.jsonl
+    python tools/replay_trace.py cast_volume_tracker_trace.jsonl --config /config/cast_volume_trackers.yaml
+
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from homeassistant.const import EVENT_HOMEASSISTANT_START
+from homeassistant.components.media_player.const import ATTR_MEDIA_VOLUME_LEVEL
+from homeassistant.components.media_player.const import DOMAIN as MEDIA_PLAYER_DOMAIN
+
+from fake_hass import FakeHass, cast_volume_tracker
+from run_scenarios import EXAMPLE_CONFIG, load_yaml
+
+# the types of records that are inputs to the trackers and outputs from them
+INPUTS = ('state', 'command')
+OUTPUTS = ('decision', 'call')
+
+
+class MemoryTraceRecorder(object):
+    """A stand-in for ``CastVolumeTrackerTraceRecorder`` that keeps the records in memory."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.records = []
+
+    def record(self, record_type, **fields):
+        """Add a record to the trace (converted to and from JSON, so that it matches the records in a trace file)."""
+        fields['t'] = round(self.clock(), 6)
+        fields['type'] = record_type
+        self.records.append(json.loads(json.dumps(fields)))
+
+
+def load_trace(path):
+    """Load the records from a trace file."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def input_batches(records):
+    """Split the input records into batches that were handled together, i.e., that have no outputs between them."""
+    batches = [[]]
+    for record in records:
+        if record['type'] in INPUTS:
+            batches[-1].append(record)
+        elif record['type'] in OUTPUTS and batches[-1]:
+            batches.append([])
+
+    return [batch for batch in batches if batch]
+
+
+def without_timestamp(record):
+    """Get a record without its ``t`` field."""
+    return {key: val for key, val in record.items() if key != 't'}
+
+
+async def async_replay(records, trackers_config):
+    """Replay the records and return the results.
+
+    Returns
+    -------
+    dict
+        The replay statistics
+    mismatch : tuple, None
+        The index, expected record, and actual record of the first output that differs from the trace, or ``None``
+
+    """
+    # don't record the replay to the original trace files
+    trackers_config = {object_id: {key: val for key, val in cfg.items() if key != cast_volume_tracker.CONF_TRACE} for object_id, cfg in trackers_config.items()}
+
+    with FakeHass() as hass:
+        # the media player states and tracker attributes when the trackers started listening
+        snapshot = {}
+        for record in records:
+            if record['type'] != 'start':
+                continue
+
+            object_id = record['object_id']
+            if record['state'] is not None:
+                hass.states.async_set('{0}.{1}'.format(MEDIA_PLAYER_DOMAIN, object_id), record['state'], {} if record['volume_level'] is None else {ATTR_MEDIA_VOLUME_LEVEL: record['volume_level']})
+
+            default_volume_level = trackers_config[object_id].get(cast_volume_tracker.CONF_DEFAULT_VOLUME_LEVEL)
+            snapshot[object_id] = [record['value'], record['is_volume_muted'], None if default_volume_level is None else 100.*float(default_volume_level)]
+
+        entities = await hass.async_setup_cast_volume_trackers(trackers_config, snapshot, simulate_media_players=False, start=False)
+
+        recorder = MemoryTraceRecorder(hass.clock)
+        for entity in entities.values():
+            entity.recorder = recorder
+
+        hass.bus.async_fire(EVENT_HOMEASSISTANT_START)
+        await hass.async_block_till_done()
+
+        t0 = records[0]['t'] if records else 0.
+        inputs = 0
+        start = time.perf_counter()
+        for batch in input_batches(records):
+            if batch[0]['t'] - t0 > hass.now:
+                await hass.async_advance(batch[0]['t'] - t0 - hass.now)
+
+            for record in batch:
+                if record['type'] == 'command':
+                    await hass.services.async_call(cast_volume_tracker.DOMAIN, record['service'], record['data'], blocking=True)
+                elif record['state'] is not None:
+                    hass.states.async_set(record['entity_id'], record['state'], {} if record['volume_level'] is None else {ATTR_MEDIA_VOLUME_LEVEL: record['volume_level']}, force_update=True)
+
+            await hass.async_block_till_done()
+            inputs += len(batch)
+
+        # let any timers that were pending at the end of the trace (e.g., coalesce windows) fire
+        if records and records[-1]['t'] - t0 > hass.now:
+            await hass.async_advance(records[-1]['t'] - t0 - hass.now)
+
+        elapsed = time.perf_counter() - start
+
+        expected = [without_timestamp(record) for record in records if record['type'] in OUTPUTS]
+        actual = [without_timestamp(record) for record in recorder.records if record['type'] in OUTPUTS]
+        mismatch = next(((i, e, a) for i, (e, a) in enumerate(zip(expected, actual)) if e != a), None)
+        if mismatch is None and len(expected) != len(actual):
+            i = min(len(expected), len(actual))
+            mismatch = (i, expected[i] if i < len(expected) else None, actual[i] if i < len(actual) else None)
+
+        casts = [cast for cast_network in hass.data[cast_volume_tracker.DATA_CAST_NETWORKS].values() for cast in cast_network.casts.values()]
+
+        return {'inputs': inputs,
+                'inputs/sec': inputs / elapsed if elapsed else float('inf'),
+                'recorded outputs': len(expected),
+                'replayed outputs': len(actual),
+                'matching outputs': mismatch[0] if mismatch else len(actual),
+                'media player calls': sum(domain == MEDIA_PLAYER_DOMAIN for domain, _, _ in hass.services.calls),
+                'updates': sum(cast.statistics.updates for cast in casts),
+                'update time (ms)': 1000. * sum(cast.statistics.update_time for cast in casts),
+                'dispatch time (ms)': 1000. * sum(cast.statistics.dispatch_time for cast in casts)}, mismatch
+
+
+def main():
+    """Replay a trace and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace', help='the trace file')
+    parser.add_argument('--config', default=os.path.join(EXAMPLE_CONFIG, 'cast_volume_trackers.yaml'), help='the `cast_volume_tracker` configuration with which the trace was recorded')
+    args = parser.parse_args()
+
+    results, mismatch = asyncio.get_event_loop().run_until_complete(async_replay(load_trace(args.trace), load_yaml(args.config)))
+    for key, val in results.items():
+        print('{:<26}{:>12.3f}'.format(key, val) if isinstance(val, float) else '{:<26}{:>12}'.format(key, val))
+
+    if mismatch:
+        i, expected, actual = mismatch
+        print('\nFirst mismatch (output #{}):\n  recorded: {}\n  replayed: {}'.format(i, expected, actual))
+
+    sys.exit(1 if mismatch else 0)
+
+
+if __name__ == '__main__':
+    main()
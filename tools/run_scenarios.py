@@ -0,0 +1,146 @@
+"""Replay the ``cca_test_*`` scripts from the example configuration against the fake Home Assistant on a virtual clock.
+
+Each script's service calls are performed, its ``delay`` steps advance the virtual clock, and the conditions in its
+``python_script.log`` templates are checked against the fake state machine.
+
+Example::
+
+    python tools/run_scenarios.py
+    python tools/run_scenarios.py example_config/scripts/cca_test_kitchen_home.yaml
+
+"""
+import argparse
+import asyncio
+import glob
+import os
+import re
+import sys
+import time
+
+import yaml
+
+from homeassistant.const import ATTR_ENTITY_ID
+
+from fake_hass import FakeHass
+
+EXAMPLE_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'example_config')
+
+# e.g., "{% if state_attr('cast_volume_tracker.kitchen_home', 'value') | round(0) == 10 %}"
+ASSERTION_REGEX = re.compile(r"state_attr\('(?P<entity_id>[^']+)', '(?P<attribute>[^']+)'\) \| round\((?P<digits>\d+)\) == (?P<expected>[-\d.]+)")
+
+# e.g., "{{ value | multiply(0.01) }}"
+MULTIPLY_REGEX = re.compile(r"\{\{\s*value\s*\|\s*multiply\((?P<factor>[-\d.]+)\)\s*\}\}")
+
+
+def load_yaml(path):
+    """Load a YAML file from the example configuration, ignoring ``!secret`` and ``!include`` tags."""
+    class Loader(yaml.SafeLoader):  # pylint: disable=too-many-ancestors
+        """A YAML loader that ignores Home Assistant's custom tags."""
+
+    Loader.add_multi_constructor('!', lambda loader, suffix, node: None)
+
+    with open(path) as f:
+        return yaml.load(f, Loader=Loader)
+
+
+def parse_delay(delay):
+    """Convert an ``'HH:MM:SS'`` delay to seconds."""
+    hours, minutes, seconds = (float(x) for x in str(delay).split(':'))
+    return 3600. * hours + 60. * minutes + seconds
+
+
+def register_input_numbers(hass, input_numbers_config):
+    """Register an ``input_number.set_value`` service that runs the ``set_value_script`` from the example configuration.
+
+    Only scripts of the form ``service: ...`` with ``data_template`` values that are either constants or
+    ``{{ value | multiply(...) }}`` are supported.
+
+    """
+    async def async_handle_set_value(call):
+        """Run the ``set_value_script`` for the targeted input numbers."""
+        entity_ids = call.data[ATTR_ENTITY_ID]
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_id.strip() for entity_id in entity_ids.split(',')]
+
+        for entity_id in entity_ids:
+            for step in input_numbers_config[entity_id.split('.', 1)[1]]['set_value_script']:
+                domain, service = step['service'].split('.')
+                data = {}
+                for key, val in step.get('data_template', step.get('data', {})).items():
+                    match = MULTIPLY_REGEX.match(str(val))
+                    data[key] = float(match.group('factor')) * float(call.data['value']) if match else val
+
+                await hass.services.async_call(domain, service, data, blocking=True)
+
+    hass.services.async_register('input_number', 'set_value', async_handle_set_value)
+
+
+async def async_run_script(path, trackers_config, input_numbers_config):
+    """Run the scripts in a file and return the results.
+
+    Returns
+    -------
+    list
+        A list of ``(passed, message)`` tuples, one for each assertion
+
+    """
+    results = []
+    for script in load_yaml(path).values():
+        with FakeHass() as hass:
+            await hass.async_setup_cast_volume_trackers(trackers_config)
+            register_input_numbers(hass, input_numbers_config)
+
+            for step in script['sequence']:
+                if 'delay' in step:
+                    await hass.async_advance(parse_delay(step['delay']))
+                    continue
+
+                if step['service'] == 'python_script.log':
+                    match = ASSERTION_REGEX.search(step['data_template']['message'])
+                    entity_id, attribute, digits, expected = match.group('entity_id', 'attribute', 'digits', 'expected')
+                    state = hass.states.get(entity_id)
+                    actual = state.attributes.get(attribute) if state else None
+                    passed = actual is not None and round(float(actual), int(digits)) == round(float(expected), int(digits))
+                    results.append((passed, '{}.{} = {} (expected {}) at t={:g}s'.format(entity_id, attribute, actual if actual is None else round(float(actual), int(digits)), expected, hass.now)))
+                    continue
+
+                domain, service = step['service'].split('.')
+                data = dict(step.get('data', {}))
+                if 'entity_id' in step:
+                    data[ATTR_ENTITY_ID] = step['entity_id']
+
+                await hass.services.async_call(domain, service, data, blocking=True)
+                await hass.async_block_till_done()
+
+    return results
+
+
+def main():
+    """Run the scenarios and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scripts', nargs='*', default=sorted(glob.glob(os.path.join(EXAMPLE_CONFIG, 'scripts', 'cca_test_*.yaml'))), help='the script files to run')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print passing assertions too')
+    args = parser.parse_args()
+
+    trackers_config = load_yaml(os.path.join(EXAMPLE_CONFIG, 'cast_volume_trackers.yaml'))
+    input_numbers_config = load_yaml(os.path.join(EXAMPLE_CONFIG, 'input_numbers.yaml'))
+
+    failures = 0
+    loop = asyncio.get_event_loop()
+    for path in args.scripts:
+        start = time.perf_counter()
+        results = loop.run_until_complete(async_run_script(path, trackers_config, input_numbers_config))
+        elapsed = time.perf_counter() - start
+
+        for passed, message in results:
+            if args.verbose or not passed:
+                print('{}: {}'.format('PASS' if passed else 'FAIL', message))
+
+        failures += sum(not passed for passed, _ in results)
+        print('{}: {}/{} passed in {:.1f} ms'.format(os.path.basename(path), sum(passed for passed, _ in results), len(results), 1000. * elapsed))
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()